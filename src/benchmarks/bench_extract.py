@@ -0,0 +1,51 @@
+"""
+Requests/second of HTML text extraction with and without the CPU process pool.
+
+    python src/benchmarks/bench_extract.py --requests 400 --concurrency 16
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.cpu_pool import CpuPool
+from utils.html_text import extract_html_text
+
+def make_page(paragraphs: int) -> bytes:
+    body = "".join(
+        f"<div class='p'><h2>Section {i}</h2><p>Lorem ipsum <b>dolor</b> sit amet, "
+        f"<a href='/x/{i}'>consectetur</a> adipiscing elit {i}.</p>"
+        f"<script>var x{i} = {i};</script><ul><li>a</li><li>b</li></ul></div>"
+        for i in range(paragraphs)
+    )
+    return f"<html><head><title>bench</title><style>p{{}}</style></head><body>{body}</body></html>".encode()
+
+def run(pool: CpuPool, page: bytes, requests: int, concurrency: int) -> float:
+    pool.run(extract_html_text, page, "utf-8")  # warm up workers
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        list(callers.map(lambda _: pool.run(extract_html_text, page, "utf-8"), range(requests)))
+    return requests / (time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    page = make_page(args.paragraphs)
+    print(f"page={len(page)} bytes | requests={args.requests} | concurrency={args.concurrency} | cores={os.cpu_count()}")
+
+    inline = CpuPool(workers=0, max_pending=args.concurrency, max_tasks_per_child=0)
+    print(f"inline (GIL-bound) : {run(inline, page, args.requests, args.concurrency):8.1f} req/s")
+
+    pool = CpuPool(workers=args.workers, max_pending=args.workers * 4, max_tasks_per_child=200)
+    try:
+        print(f"process pool (x{args.workers:<2}): {run(pool, page, args.requests, args.concurrency):8.1f} req/s")
+    finally:
+        pool.shutdown()
@@ -0,0 +1,180 @@
+"""
+Streaming export of search_turns / mcp_logs to Parquet or Arrow IPC files.
+
+    cd src && python -m db.export search_turns --out turns.parquet --since 2025-09-01 --until 2025-10-01
+    cd src && python -m db.export mcp_logs --out logs.arrow --format arrow --session-id abc
+
+Rows come from a server-side cursor and are written one record batch at a time, so memory
+stays flat regardless of the time range. JSON payloads are flattened into typed columns.
+Needs pyarrow (`pip install mcp-server[export]`).
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.env import get_env_variable
+
+EXPORT_BATCH_SIZE = int(get_env_variable("EXPORT_BATCH_SIZE", "10000"))
+FORMATS = ("parquet", "arrow")
+
+def _pa():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("db.export needs pyarrow: pip install 'mcp-server[export]'") from e
+    return pyarrow
+
+def _path(*keys: str) -> Callable[[Dict[str, Any]], Any]:
+    def get(row: Dict[str, Any]) -> Any:
+        value: Any = row
+        for k in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(k)
+        return value
+    return get
+
+def _json(key: str) -> Callable[[Dict[str, Any]], Any]:
+    return lambda row: None if row.get(key) is None else json.dumps(row[key], ensure_ascii=False, default=str)
+
+def _text_len(*keys: str) -> Callable[[Dict[str, Any]], Any]:
+    get = _path(*keys)
+    return lambda row: len(get(row)) if isinstance(get(row), str) else None
+
+# (column, arrow type name, getter); pyarrow types are resolved lazily
+Column = Tuple[str, str, Callable[[Dict[str, Any]], Any]]
+
+TABLES: Dict[str, List[Column]] = {
+    "search_turns": [
+        ("id", "string", lambda r: str(r["id"])),
+        ("ts", "timestamp", _path("ts")),
+        ("session_id", "string", _path("session_id")),
+        ("original_query", "string", _path("original_query")),
+        ("rewritten_query", "string", _path("rewritten_query")),
+        ("used_query", "string", _path("used_query")),
+        ("provider", "string", _path("provider")),
+        ("prefer_academic", "bool", _path("inferred_prefs", "prefer_academic")),
+        ("time_range", "string", _path("inferred_prefs", "time_range")),
+        ("extra_sites", "list<string>", _path("inferred_prefs", "extra_sites")),
+        ("filetype_pdf", "bool", _path("inferred_prefs", "filetype_pdf")),
+        ("target_language", "string", _path("inferred_prefs", "target_language")),
+        ("latency_ms", "int64", _path("result_meta", "latency_ms")),
+        ("top_urls", "list<string>", _path("result_meta", "top_urls")),
+        ("summary_chars", "int64", _text_len("result_meta", "summary")),
+        ("model_rewrite", "string", _path("result_meta", "models", "rewrite")),
+        ("model_chunk", "string", _path("result_meta", "models", "chunk")),
+        ("model_merge", "string", _path("result_meta", "models", "merge")),
+        ("scrape_candidates", "int64", _path("result_meta", "scrape", "candidates")),
+        ("scrape_used", "int64", _path("result_meta", "scrape", "used")),
+        ("scrape_failed", "int64", _path("result_meta", "scrape", "failed")),
+        ("scrape_from_provider", "int64", _path("result_meta", "scrape", "from_provider")),
+        ("scrape_fetched", "int64", _path("result_meta", "scrape", "fetched")),
+        ("scrape_deadline_hit", "bool", _path("result_meta", "scrape", "deadline_hit")),
+        ("scrape_latency_ms", "int64", _path("result_meta", "scrape", "latency_ms")),
+        ("batch_id", "string", _path("result_meta", "batch_id")),
+    ],
+    "mcp_logs": [
+        ("id", "string", lambda r: str(r["id"])),
+        ("ts", "timestamp", _path("ts")),
+        ("session_id", "string", _path("session_id")),
+        ("request_id", "string", _path("request_id")),
+        ("level", "string", _path("level")),
+        ("message", "string", _path("message")),
+        ("meta", "string", _json("meta")),
+    ],
+}
+
+def arrow_schema(table: str):
+    pa = _pa()
+    types = {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "list<string>": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[kind]) for name, kind, _ in TABLES[table]])
+
+def flatten(table: str, rows: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    columns = TABLES[table]
+    out: Dict[str, List[Any]] = {name: [] for name, _, _ in columns}
+    for row in rows:
+        for name, _, get in columns:
+            out[name].append(get(row))
+    return out
+
+def stream_rows(table: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                session_ids: Optional[Sequence[str]] = None,
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Yield lists of row dicts from a server-side cursor, `batch_size` rows at a time."""
+    from sqlalchemy import select
+
+    from db.sqlalchemy import engine
+    from models import MCPLog, SearchTurn
+
+    model = {"search_turns": SearchTurn, "mcp_logs": MCPLog}[table]
+    # no ORDER BY: a month-sized sort would defeat streaming; ts is a column in the output
+    stmt = select(model.__table__)
+    if since is not None:
+        stmt = stmt.where(model.ts >= since)
+    if until is not None:
+        stmt = stmt.where(model.ts < until)
+    if session_ids:
+        stmt = stmt.where(model.session_id.in_(list(session_ids)))
+
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for part in result.mappings().partitions():
+            yield [dict(r) for r in part]
+
+def write_batches(table: str, batches: Iterable[List[Dict[str, Any]]], out: str, fmt: str = "parquet") -> Dict[str, Any]:
+    """Write row batches as they arrive; only one batch is held in memory."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    pa = _pa()
+    schema = arrow_schema(table)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(out, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(out, schema)
+        write = writer.write_batch
+
+    rows = n_batches = 0
+    t0 = time.perf_counter()
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            write(pa.RecordBatch.from_pydict(flatten(table, batch), schema=schema))
+            rows += len(batch)
+            n_batches += 1
+    finally:
+        writer.close()
+    return {"table": table, "out": out, "format": fmt, "rows": rows, "batches": n_batches,
+            "seconds": round(time.perf_counter() - t0, 2)}
+
+def parse_ts(value: str) -> datetime:
+    """ISO date/time for --since / --until; one without an offset is UTC, not the server's local time."""
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+def export_table(table: str, out: str, fmt: str = "parquet", since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, session_ids: Optional[Sequence[str]] = None,
+                 batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, Any]:
+    return write_batches(table, stream_rows(table, since, until, session_ids, batch_size), out, fmt)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--since", type=parse_ts, help="inclusive, ISO date/time (UTC unless an offset is given)")
+    parser.add_argument("--until", type=parse_ts, help="exclusive, ISO date/time (UTC unless an offset is given)")
+    parser.add_argument("--session-id", action="append", dest="session_ids")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    print(export_table(args.table, args.out, args.format, args.since, args.until, args.session_ids, args.batch_size))
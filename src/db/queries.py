@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import Select, select, tuple_
+
+from db.sqlalchemy import session_scope
+from models import MCPLog, SearchTurn
+
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(ts: datetime, row_id: uuid.UUID) -> str:
+    return f"{ts.isoformat()}|{row_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    ts, row_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(ts), uuid.UUID(row_id)
+
+def _row_dict(row: Any, columns: List[str]) -> Dict[str, Any]:
+    return {c: getattr(row, c) for c in columns}
+
+def _page_query(model: Any, session_id: str, limit: int, cursor: Optional[str], extra_where: List[Any]) -> Select:
+    # one extra row tells whether another page follows
+    stmt = select(model).where(model.session_id == session_id, *extra_where)
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.ts, model.id) < tuple_(ts, row_id))
+    return stmt.order_by(model.ts.desc(), model.id.desc()).limit(limit + 1)
+
+def _page(model: Any, session_id: str, limit: int, cursor: Optional[str], extra_where: List[Any]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Newest-first keyset page over (ts, id) for one session; served by the (session_id, ts) index.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = _page_query(model, session_id, limit, cursor, extra_where)
+
+    columns = [c.name for c in model.__table__.columns]
+    with session_scope() as db:
+        rows = [_row_dict(r, columns) for r in db.execute(stmt).scalars()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["ts"], rows[-1]["id"])
+    return rows, next_cursor
+
+def session_history(session_id: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    return _page(SearchTurn, session_id, limit, cursor, [])
+
+def session_logs(session_id: str, limit: int = 100, cursor: Optional[str] = None,
+                 level: Optional[str] = None, request_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    where = []
+    if level:
+        where.append(MCPLog.level == level)
+    if request_id:
+        where.append(MCPLog.request_id == request_id)
+    return _page(MCPLog, session_id, limit, cursor, where)
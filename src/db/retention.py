@@ -0,0 +1,58 @@
+"""
+Batched retention for append-only tables.
+
+    cd src && python -m db.retention            # uses *_RETENTION_DAYS from env
+    cd src && python -m db.retention --dry-run
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from sqlalchemy import Delete, delete, func, select
+
+from db.sqlalchemy import engine
+from models import MCPLog, SearchTurn
+from utils.env import get_env_variable
+
+LOG_RETENTION_DAYS = int(get_env_variable("LOG_RETENTION_DAYS", "30"))
+TURN_RETENTION_DAYS = int(get_env_variable("TURN_RETENTION_DAYS", "180"))
+RETENTION_BATCH_SIZE = int(get_env_variable("RETENTION_BATCH_SIZE", "5000"))
+
+def _delete_batch(model: Any, cutoff: datetime, batch_size: int) -> Delete:
+    # no ORDER BY: any expired rows will do, and sorting on ts would need a btree index,
+    # while ts only has a BRIN index (a bitmap scan of the old block ranges finds them)
+    victims = select(model.id).where(model.ts < cutoff).limit(batch_size)
+    return delete(model).where(model.id.in_(victims.scalar_subquery()))
+
+def purge_older_than(model: Any, days: int, batch_size: int = RETENTION_BATCH_SIZE,
+                     pause_s: float = 0.05, dry_run: bool = False) -> int:
+    """
+    Delete rows older than `days`, `batch_size` rows per transaction, so locks and WAL
+    bursts stay small while the server keeps writing. Returns the number of rows deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    if dry_run:
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(model).where(model.ts < cutoff)).scalar() or 0
+
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(_delete_batch(model, cutoff, batch_size)).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(pause_s)
+
+def run_retention(dry_run: bool = False) -> Dict[str, int]:
+    return {
+        MCPLog.__tablename__: purge_older_than(MCPLog, LOG_RETENTION_DAYS, dry_run=dry_run),
+        SearchTurn.__tablename__: purge_older_than(SearchTurn, TURN_RETENTION_DAYS, dry_run=dry_run),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="only count rows that would be deleted")
+    args = parser.parse_args()
+    print(run_retention(dry_run=args.dry_run))
@@ -1,5 +1,6 @@
 import os, threading
 from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from utils.env import get_env_variable
@@ -22,8 +23,25 @@ def init_db() -> None:
         with engine.begin() as conn:
             conn.execute(text('create extension if not exists "pgcrypto";'))
         Base.metadata.create_all(bind=engine) 
+        with engine.begin() as conn:
+            _upgrade_schema(conn)
         _initialized = True
 
+def _upgrade_schema(conn) -> None:
+    """Bring tables created by older versions up to date: JSON -> JSONB, missing indexes."""
+    for table in Base.metadata.sorted_tables:
+        for col in table.columns:
+            if not isinstance(col.type, JSONB):
+                continue
+            current = conn.execute(text(
+                "select data_type from information_schema.columns "
+                "where table_schema = current_schema() and table_name = :t and column_name = :c"
+            ), {"t": table.name, "c": col.name}).scalar()
+            if current == "json":
+                conn.execute(text(f'alter table "{table.name}" alter column "{col.name}" type jsonb using "{col.name}"::jsonb'))
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
 from contextlib import contextmanager
 @contextmanager
 def session_scope():
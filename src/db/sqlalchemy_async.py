@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Tuple
+import asyncio
+import weakref
+
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from utils.env import get_env_variable
+
+DB_POOL_SIZE = int(get_env_variable("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(get_env_variable("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = float(get_env_variable("DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_RECYCLE_S = int(get_env_variable("DB_POOL_RECYCLE_S", "1800"))
+# set to 0 behind a transaction-mode pgbouncer (e.g. the Supabase pooler on :6543)
+DB_STATEMENT_CACHE_SIZE = int(get_env_variable("DB_STATEMENT_CACHE_SIZE", "256"))
+
+# asyncpg connections belong to the loop that opened them, so each event loop gets its own pool
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[AsyncEngine, async_sessionmaker]]" = \
+    weakref.WeakKeyDictionary()
+
+def async_database_url(url: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    SUPABASE_DB_URL is a plain postgres URL; point it at the asyncpg driver.
+    asyncpg does not understand libpq's `sslmode`, so it is moved into connect args as `ssl`.
+    """
+    u = make_url(url)
+    connect_args: Dict[str, Any] = {}
+    if "sslmode" in u.query:
+        connect_args["ssl"] = u.query["sslmode"]
+        u = u.difference_update_query(["sslmode"])
+    return u.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False), connect_args
+
+def _create_engine() -> Tuple[AsyncEngine, async_sessionmaker]:
+    url, connect_args = async_database_url(get_env_variable("SUPABASE_DB_URL"))
+    engine = create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_S,
+        pool_recycle=DB_POOL_RECYCLE_S,
+        pool_pre_ping=True,
+        connect_args={
+            **connect_args,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+async def get_async_engine() -> AsyncEngine:
+    """Engine of the running loop; creating it does not await, so no lock is needed."""
+    loop = asyncio.get_running_loop()
+    if loop not in _engines:
+        _engines[loop] = _create_engine()
+    return _engines[loop][0]
+
+async def get_async_session() -> async_sessionmaker:
+    await get_async_engine()
+    return _engines[asyncio.get_running_loop()][1]
+
+async def bulk_insert(model: Any, rows: List[Dict[str, Any]]) -> int:
+    """Insert many rows in one round trip (multi-row INSERT via executemany)."""
+    if not rows:
+        return 0
+    engine = await get_async_engine()
+    async with engine.begin() as conn:
+        await conn.execute(insert(model.__table__), rows)
+    return len(rows)
+
+async def dispose_async_engine() -> None:
+    """Close the running loop's pool; engines of other loops are left alone."""
+    entry = _engines.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].dispose()
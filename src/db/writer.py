@@ -0,0 +1,95 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from db.sqlalchemy_async import bulk_insert
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+WRITER_BATCH_SIZE = int(get_env_variable("DB_WRITER_BATCH_SIZE", "200"))
+WRITER_FLUSH_INTERVAL_S = float(get_env_variable("DB_WRITER_FLUSH_INTERVAL_S", "0.5"))
+WRITER_MAX_BUFFER = int(get_env_variable("DB_WRITER_MAX_BUFFER", "10000"))
+WRITER_MAX_RETRIES = int(get_env_variable("DB_WRITER_MAX_RETRIES", "3"))
+WRITER_RETRY_BACKOFF_S = 0.5
+
+def _transient(e: Exception) -> bool:
+    """Connection-level failures worth retrying; constraint / data errors are not."""
+    if isinstance(e, (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(e, DBAPIError) and e.connection_invalidated
+
+class BulkWriter:
+    """
+    Buffers rows for one table and writes them with multi-row INSERTs on the pooled async engine.
+    - add() never waits on the database; a background task flushes every `flush_interval_s`.
+    - The buffer is bounded: when the database falls behind, the oldest rows are dropped.
+    - Transient failures are retried with backoff before a batch is given up.
+    - add() from a thread without a running loop wakes the loop that owns the writer; rows added
+      before any loop has used the writer stay buffered until flush() is awaited.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = WRITER_BATCH_SIZE,
+                 flush_interval_s: float = WRITER_FLUSH_INTERVAL_S, max_buffer: int = WRITER_MAX_BUFFER) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._rows: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self.max_retries = WRITER_MAX_RETRIES
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _model(self):
+        # lazy: importing models binds the sync engine, which needs SUPABASE_DB_URL
+        import models
+        return getattr(models, self.model_name)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        if len(self._rows) == self._rows.maxlen:
+            METRICS.inc("db_writer_dropped_total", labels={"table": self.model_name})
+        self._rows.append(row)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            owner = self._loop
+            if owner is not None and not owner.is_closed():
+                owner.call_soon_threadsafe(self._schedule, owner)
+            return
+        self._schedule(loop)
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop) -> None:
+        task = self._task
+        if task is not None and not task.done() and not task.get_loop().is_closed():
+            return
+        # a task left pending on a closed loop will never run again; rebind to this one
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._rows:
+            await asyncio.sleep(self.flush_interval_s)
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self._rows:
+            batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            if await self._insert(batch):
+                METRICS.inc("db_writer_rows_total", len(batch), labels={"table": self.model_name})
+            else:
+                METRICS.inc("db_writer_failed_total", len(batch), labels={"table": self.model_name})
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await bulk_insert(self._model(), batch)
+                return True
+            except Exception as e:
+                if not _transient(e) or attempt == self.max_retries:
+                    return False
+                METRICS.inc("db_writer_retries_total", labels={"table": self.model_name})
+                await asyncio.sleep(WRITER_RETRY_BACKOFF_S * 2 ** attempt)
+        return False
+
+LOG_WRITER = BulkWriter("MCPLog")
+TURN_WRITER = BulkWriter("SearchTurn")
@@ -1,13 +1,10 @@
 import argparse
-import asyncio
 from db.sqlalchemy import init_db
 from sse.run_http_server import mcp  
 import models
-from configs.db_async import get_supabase_async
 
 
 if __name__ == "__main__":
-    asyncio.run(get_supabase_async()) 
     init_db() 
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", choices=["stdio", "http"], default="stdio")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, JSON, TIMESTAMP, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Index, String, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from db.sqlalchemy import Base
 
 class MCPLog(Base):
@@ -12,4 +12,13 @@ class MCPLog(Base):
     request_id = Column(String)
     level = Column(String, nullable=False)   
     message = Column(String, nullable=False)
-    meta = Column(JSON)
\ No newline at end of file
+    meta = Column(JSONB)
+
+    __table_args__ = (
+        # session log pages (keyset on ts, id)
+        Index("ix_mcp_logs_session_ts", "session_id", "ts"),
+        Index("ix_mcp_logs_request_id", "request_id"),
+        # append-only: BRIN keeps time-range scans and retention deletes cheap
+        Index("ix_mcp_logs_ts_brin", "ts", postgresql_using="brin"),
+        Index("ix_mcp_logs_meta", "meta", postgresql_using="gin", postgresql_ops={"meta": "jsonb_path_ops"}),
+    )
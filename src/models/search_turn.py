@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, JSON, TIMESTAMP, Integer, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Index, String, TIMESTAMP, Integer, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from db.sqlalchemy import Base
 
 class SearchTurn(Base):
@@ -11,5 +11,13 @@ class SearchTurn(Base):
     rewritten_query = Column(String)
     used_query = Column(String)
     provider = Column(String)
-    inferred_prefs = Column(JSON)
-    result_meta = Column(JSON)
\ No newline at end of file
+    inferred_prefs = Column(JSONB)
+    result_meta = Column(JSONB)
+
+    __table_args__ = (
+        # session history pages (keyset on ts, id)
+        Index("ix_search_turns_session_ts", "session_id", "ts"),
+        Index("ix_search_turns_ts_brin", "ts", postgresql_using="brin"),
+        Index("ix_search_turns_prefs", "inferred_prefs", postgresql_using="gin",
+              postgresql_ops={"inferred_prefs": "jsonb_path_ops"}),
+    )
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from tools.rewrite import rewrite_query
+from tools.scrape import fetch_page_text, run_fetch
+from tools.summarize import summarize_text
+from services.prefetch_service import PAGE_CACHE
+from services.search_service import fan_out_search
+from utils.executors import GEMINI_EXECUTOR, run_in
+from utils.local_rewrite import REWRITE_LLM, REWRITE_LOCAL, REWRITE_LOCAL_FALLBACK, REWRITE_LOCAL_MIN_CONFIDENCE, local_rewrite
+from utils.model_router import call_tracked, record_models
+
+DEFAULT_BATCH_CONCURRENCY = 4
+MAX_BATCH_CONCURRENCY = 16
+# kinds of shared work that run off the default executor
+_EXECUTORS = {"rewrite": GEMINI_EXECUTOR, "summarize": GEMINI_EXECUTOR}
+
+
+class BatchWorkspace:
+    """
+    Shared work for one smart_search_batch call.
+    Identical rewrites, searches, page fetches and summaries are started once
+    and every query that needs them awaits the same task. Provider calls run
+    in worker threads so they overlap instead of blocking the event loop.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> None:
+        self.slots = asyncio.Semaphore(max(1, min(concurrency, MAX_BATCH_CONCURRENCY)))
+        self._tasks: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self.calls: Counter = Counter()
+        self.reused: Counter = Counter()
+
+    async def _shared(self, kind: str, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Blocking fn(*args) in a worker thread, started once per key. The task runs in the
+        context of the query that started it, so the models it used are returned with the
+        result and recorded for every query that awaits it.
+        """
+        result, models = await self._shared_async(
+            kind, key, lambda: run_in(_EXECUTORS.get(kind), call_tracked, fn, *args))
+        record_models(models)
+        return result
+
+    def _shared_async(self, kind: str, key: Hashable, start: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        k = (kind, key)
+        task = self._tasks.get(k)
+        if task is None:
+            self.calls[kind] += 1
+            task = asyncio.ensure_future(start())
+            self._tasks[k] = task
+        else:
+            self.reused[kind] += 1
+        # shield: one query being cancelled must not cancel work others wait on
+        return asyncio.shield(task)
+
+    async def rewrite(self, query: str, prefs: Dict[str, Any]) -> Tuple[Optional[str], str, str]:
+        local = local_rewrite(query, **prefs)
+        if local.confidence >= REWRITE_LOCAL_MIN_CONFIDENCE:
+            return local.query, local.query, REWRITE_LOCAL
+        key = (" ".join(query.lower().split()), json.dumps(prefs, sort_keys=True, default=str))
+        try:
+            rewritten = (await self._shared("rewrite", key, rewrite_query.invoke, {"query": query, **prefs})).strip()
+            if rewritten:
+                return rewritten, rewritten, REWRITE_LLM
+        except Exception:
+            pass
+        return local.query, local.query, REWRITE_LOCAL_FALLBACK
+
+    async def search(self, use_query: str) -> Tuple[Dict[str, Any], Optional[int]]:
+        return await self._shared_async("search", " ".join(use_query.split()), lambda: fan_out_search(use_query))
+
+    async def scrape(self, url: str, timeout: float = 15) -> str:
+        cached = PAGE_CACHE.get(url)
+        if cached is not None:
+            return cached
+        return await self._shared_async("scrape", url, lambda: run_fetch(fetch_page_text, url, timeout)) or ""
+
+    async def summarize(self, combined: str, query: str, target_language: Optional[str]) -> Optional[str]:
+        payload = {
+            "text": combined,
+            "max_words": 250,
+            "language": target_language,
+            "style": "balanced",
+            "include_bullets": True,
+            "title": query,
+        }
+        digest = hashlib.sha1(combined.encode("utf-8")).hexdigest()
+        try:
+            return await self._shared("summarize", (digest, query, target_language), summarize_text.invoke, payload)
+        except Exception:
+            return None
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "provider_calls": dict(self.calls),
+            "reused": dict(self.reused),
+        }
+
@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+JOB_WORKERS = int(get_env_variable("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(get_env_variable("JOB_MAX_QUEUED", "10000"))
+JOB_RESULT_TTL_S = int(get_env_variable("JOB_RESULT_TTL_S", "3600"))
+JOB_LOG_LINES = 50
+
+# lower value = picked first
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobQueueFull(RuntimeError):
+    """Raised when the job queue already holds JOB_MAX_QUEUED jobs."""
+
+class Job:
+    def __init__(self, kind: str, priority: str, params: Dict[str, Any],
+                 run: Callable[["JobReporter"], Awaitable[Dict[str, Any]]], key: Optional[str] = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.priority = priority
+        self.key = key
+        self.seq = 0
+        self.params = params
+        self.run = run
+        self.status = QUEUED
+        self.progress = 0.0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.lines: Deque[Tuple[int, str, str]] = deque(maxlen=JOB_LOG_LINES)
+        self.lines_total = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def changed(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_changed(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def log(self, level: str, message: str) -> None:
+        self.lines_total += 1
+        self.lines.append((self.lines_total, level, message))
+        self.changed()
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        out = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": round(self.progress, 1),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "recent_log": [f"[{level}] {msg}" for _, level, msg in self.lines],
+        }
+        if self.error:
+            out["error"] = self.error
+        if include_result and self.status == DONE:
+            out["result"] = self.result
+        return out
+
+class JobReporter:
+    """ctx stand-in handed to the pipeline: records progress and log lines on the job."""
+
+    def __init__(self, job: Job) -> None:
+        self.job = job
+
+    async def debug(self, message: str) -> None:
+        pass  # previews / replays are not worth keeping per job
+
+    async def info(self, message: str) -> None:
+        self.job.log("info", message)
+
+    async def warning(self, message: str) -> None:
+        self.job.log("warning", message)
+
+    async def error(self, message: str) -> None:
+        self.job.log("error", message)
+
+    async def report_progress(self, progress: float, total: float = 100) -> None:
+        self.job.progress = 100.0 * progress / total if total else 0.0
+        self.job.changed()
+
+class JobQueue:
+    """
+    Priority job queue served by a fixed pool of worker tasks.
+    submit() only enqueues, so bursts far above the pool size are accepted up to
+    `max_queued`; finished jobs are kept for `ttl_s` and then dropped.
+    Jobs sharing a `key` (the session id) run one at a time, in submission order within a priority.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED,
+                 ttl_s: float = JOB_RESULT_TTL_S) -> None:
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.ttl_s = ttl_s
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._queued = 0
+        self._running = 0
+        # key -> jobs parked while another job with that key runs
+        self._busy: Dict[str, List[Job]] = {}
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # jobs left on a previous loop (server restarted in-process, shutdown) can never run
+        for job in self.jobs.values():
+            if job.status not in FINISHED:
+                self._finish(job, FAILED, "job queue restarted before the job finished")
+        self._queued = self._running = 0
+        self._busy = {}
+        self._publish()
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [loop.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    def _publish(self) -> None:
+        METRICS.set_gauge("jobs_queued", self._queued)
+        METRICS.set_gauge("jobs_running", self._running)
+
+    def _sweep(self) -> None:
+        cutoff = time.time() - self.ttl_s
+        for job_id in [j.id for j in self.jobs.values() if j.status in FINISHED and (j.finished_at or 0) < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, kind: str, run: Callable[[JobReporter], Awaitable[Dict[str, Any]]],
+               priority: str = "normal", params: Optional[Dict[str, Any]] = None, key: Optional[str] = None) -> Job:
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"priority must be one of {list(JOB_PRIORITIES)}")
+        self._ensure_workers()
+        self._sweep()
+        if self._queued >= self.max_queued:
+            METRICS.inc("jobs_rejected_total")
+            raise JobQueueFull(f"{self._queued} jobs already queued; try again later")
+        job = Job(kind, priority, params or {}, run, key)
+        job.seq = next(self._seq)
+        self.jobs[job.id] = job
+        self._enqueue(job)
+        self._queued += 1
+        self._publish()
+        return job
+
+    def _enqueue(self, job: Job) -> None:
+        self._queue.put_nowait((JOB_PRIORITIES[job.priority], job.seq, job))
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def get(self, job_id: str) -> Job:
+        self._sweep()
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"unknown or expired job: {job_id}")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.status in FINISHED:
+            return job
+        if job.status == QUEUED:
+            # left in the heap; the worker skips it
+            self._queued -= 1
+            self._finish(job, CANCELLED)
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        METRICS.inc("jobs_total", labels={"kind": job.kind, "status": status})
+        self._publish()
+        job.changed()
+
+    async def watch(self, job_id: str, ctx: Any = None, wait_s: float = 60) -> Job:
+        """
+        Forward the job's log lines and progress to `ctx` as they happen, until the job
+        finishes or `wait_s` passes; returns the job either way.
+        """
+        job = self.get(job_id)
+        loop = asyncio.get_running_loop()
+        until = loop.time() + wait_s
+        seen = 0
+        while True:
+            if ctx is not None:
+                # only what was actually forwarded counts as seen; the job keeps logging while we await
+                for seq, level, message in list(job.lines):
+                    if seq > seen:
+                        await getattr(ctx, level)(message)
+                        seen = seq
+                await ctx.report_progress(job.progress, 100)
+            remaining = until - loop.time()
+            if ctx is not None and job.lines_total > seen and remaining > 0:
+                continue
+            if job.status in FINISHED or remaining <= 0:
+                return job
+            await job.wait_changed(remaining)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+            if job.key is not None:
+                if job.key in self._busy:
+                    self._busy[job.key].append(job)
+                    continue
+                self._busy[job.key] = []
+            self._queued -= 1
+            self._running += 1
+            job.status = RUNNING
+            job.started_at = time.time()
+            METRICS.observe("job_queue_wait_ms", (job.started_at - job.created_at) * 1000, {"kind": job.kind})
+            self._publish()
+            job.changed()
+            job.task = asyncio.ensure_future(job.run(JobReporter(job)))
+            try:
+                job.result = await job.task
+                job.progress = 100.0
+                self._finish(job, DONE)
+            except asyncio.CancelledError:
+                self._finish(job, CANCELLED)
+                if asyncio.current_task().cancelling():
+                    raise  # the worker itself is being shut down
+            except Exception as e:
+                self._finish(job, FAILED, f"{type(e).__name__}: {e}")
+            finally:
+                self._running -= 1
+                self._publish()
+                job.task = None
+                # parked jobs go back with their original order; the next one will claim the key
+                if job.key is not None:
+                    for parked in self._busy.pop(job.key):
+                        self._enqueue(parked)
+
+    async def shutdown(self) -> None:
+        for job in self.jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._loop = None
+
+JOBS = JobQueue()
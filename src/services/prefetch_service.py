@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from services.scrape_service import is_usable
+from services.search_service import canonical_url
+from tools.scrape import fetch_page_text, run_fetch
+from utils.env import get_env_variable
+from utils.executors import PREFETCH_EXECUTOR
+from utils.loop_monitor import loop_scope, set_stage
+from utils.metrics import METRICS
+from utils.state import SearchState
+
+PREFETCH_ENABLED = get_env_variable("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+PREFETCH_MAX_PAGES = int(get_env_variable("PREFETCH_MAX_PAGES", "4"))
+# wait this long after a turn finishes before using the network again
+PREFETCH_DELAY_MS = int(get_env_variable("PREFETCH_DELAY_MS", "500"))
+PREFETCH_FETCH_TIMEOUT_S = 15
+PAGE_CACHE_SIZE = int(get_env_variable("PAGE_CACHE_SIZE", "200"))
+PAGE_CACHE_TTL_S = int(get_env_variable("PAGE_CACHE_TTL_S", "600"))
+
+class PageCache:
+    """Bounded LRU of extracted page text keyed by canonical URL; entries expire after `ttl_s`."""
+
+    def __init__(self, max_entries: int = PAGE_CACHE_SIZE, ttl_s: float = PAGE_CACHE_TTL_S) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[str]:
+        key = canonical_url(url)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                METRICS.inc("page_cache_misses_total")
+                return None
+            self._data.move_to_end(key)
+        METRICS.inc("page_cache_hits_total")
+        return entry[1]
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            entry = self._data.get(canonical_url(url))
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def put(self, url: str, text: str) -> None:
+        key = canonical_url(url)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, text)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            METRICS.set_gauge("page_cache_entries", len(self._data))
+
+PAGE_CACHE = PageCache()
+
+def predict_pages(state: SearchState, raw: Dict[str, Any], used_urls: List[str], limit: int = PREFETCH_MAX_PAGES) -> List[str]:
+    """
+    Hits from the last search that were not read, most likely first. Follow-up queries in a
+    session tend to refine the last one and keep returning the same sources, so hits on
+    domains the session has already used rank ahead of the rest; ties keep search order.
+    """
+    used = {canonical_url(u) for u in used_urls}
+    seen_domains = {
+        (urlsplit(u).hostname or "").lower()
+        for turn in state.turns
+        for u in (turn.result_meta or {}).get("top_urls") or []
+    }
+    candidates = []
+    for rank, hit in enumerate((raw or {}).get("results") or []):
+        url = hit.get("url") or hit.get("link")
+        if not url or canonical_url(url) in used or url in PAGE_CACHE:
+            continue
+        familiar = (urlsplit(url).hostname or "").lower() in seen_domains
+        candidates.append((not familiar, rank, url))
+    return [url for _, _, url in sorted(candidates)[:limit]]
+
+class Prefetcher:
+    """
+    Speculative page fetches between turns of a session, one page at a time, on PREFETCH_EXECUTOR.
+    Any foreground request cancels all of them (a download in progress stops reading);
+    pages already fetched stay in PAGE_CACHE.
+    """
+
+    def __init__(self, cache: PageCache = PAGE_CACHE, delay_ms: int = PREFETCH_DELAY_MS) -> None:
+        self.cache = cache
+        self.delay_s = delay_ms / 1000
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, session_id: str, urls: List[str]) -> Optional[asyncio.Task]:
+        if not urls:
+            return None
+        self.cancel(session_id)
+        task = asyncio.ensure_future(self._run(session_id, urls))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(session_id, None) if self._tasks.get(session_id) is t else None)
+        return task
+
+    def cancel(self, session_id: str) -> None:
+        task = self._tasks.pop(session_id, None)
+        if task is None or task.done():
+            return
+        loop = task.get_loop()
+        if loop.is_closed():
+            return  # nothing left to run it
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        # the sync tools schedule on their own background loop; Task.cancel is not thread-safe
+        if loop is running:
+            task.cancel()
+        else:
+            loop.call_soon_threadsafe(task.cancel)
+        METRICS.inc("prefetch_cancelled_total")
+
+    def cancel_all(self) -> None:
+        for session_id in list(self._tasks):
+            self.cancel(session_id)
+
+    async def _run(self, session_id: str, urls: List[str]) -> None:
+        with loop_scope("prefetch", session_id):
+            set_stage("scrape")
+            await asyncio.sleep(self.delay_s)
+            for url in urls:
+                if url in self.cache:
+                    continue
+                try:
+                    content = await run_fetch(fetch_page_text, url, PREFETCH_FETCH_TIMEOUT_S, executor=PREFETCH_EXECUTOR)
+                except Exception:
+                    continue
+                if is_usable(content):
+                    self.cache.put(url, content)
+                    METRICS.inc("prefetch_pages_total")
+
+PREFETCHER = Prefetcher()
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from tools.scrape import FETCH_ERROR_PREFIX
+from utils.env import get_env_variable
+
+SCRAPE_K = int(get_env_variable("SCRAPE_K", "3"))
+SCRAPE_EXTRA = int(get_env_variable("SCRAPE_EXTRA", "2"))
+SCRAPE_DEADLINE_MS = int(get_env_variable("SCRAPE_DEADLINE_MS", "8000"))
+# 0 = no size target; stop only on K usable pages / deadline
+SCRAPE_TARGET_CHARS = int(get_env_variable("SCRAPE_TARGET_CHARS", "0"))
+MIN_USABLE_CHARS = int(get_env_variable("SCRAPE_MIN_USABLE_CHARS", "200"))
+# provider-returned page text at least this long is used instead of fetching the page
+PROVIDER_CONTENT_MIN_CHARS = int(get_env_variable("PROVIDER_CONTENT_MIN_CHARS", "1000"))
+# same cap as extract_html_text, so provider pages and fetched pages weigh the same
+PROVIDER_CONTENT_MAX_CHARS = 10000
+
+class FanoutPlan(BaseModel):
+    k: int = Field(SCRAPE_K, ge=1, le=10, description="Pages to keep")
+    extra: int = Field(SCRAPE_EXTRA, ge=0, le=10, description="Extra candidates fetched as hedges")
+    deadline_ms: int = Field(SCRAPE_DEADLINE_MS, ge=500, le=60000, description="Deadline for the whole fan-out")
+    target_chars: int = Field(SCRAPE_TARGET_CHARS, ge=0, description="Stop once this much text is collected (0 = off)")
+
+    @classmethod
+    def from_args(cls, k: Optional[int] = None, extra: Optional[int] = None,
+                  deadline_ms: Optional[int] = None, target_chars: Optional[int] = None) -> "FanoutPlan":
+        given = dict(k=k, extra=extra, deadline_ms=deadline_ms, target_chars=target_chars)
+        return cls(**{key: v for key, v in given.items() if v is not None})
+
+    @property
+    def candidates(self) -> int:
+        return self.k + self.extra
+
+def is_usable(content: Optional[str]) -> bool:
+    return bool(content) and not content.startswith(FETCH_ERROR_PREFIX) and len(content) >= MIN_USABLE_CHARS
+
+def provider_content(raw: Dict[str, Any], urls: List[str]) -> Dict[str, str]:
+    """Page text the search provider already returned (`raw_content`) for the given URLs, when long enough."""
+    wanted = set(urls)
+    pages: Dict[str, str] = {}
+    for hit in (raw or {}).get("results") or []:
+        url = hit.get("url") or hit.get("link")
+        text = (hit.get("raw_content") or "").strip()
+        if url in wanted and len(text) >= PROVIDER_CONTENT_MIN_CHARS:
+            pages[url] = text[:PROVIDER_CONTENT_MAX_CHARS]
+    return pages
+
+async def scrape_hedged(
+    urls: List[str],
+    fetch: Callable[[str, float], Awaitable[str]],
+    plan: FanoutPlan,
+    on_page: Optional[Callable[[int, str, Optional[str], Optional[BaseException]], Awaitable[None]]] = None,
+    prefetched: Optional[Dict[str, str]] = None,
+) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+    """
+    Fetch all candidate URLs at once and return as soon as `plan.k` usable pages (or
+    `plan.target_chars` of text) are in, or the deadline passes. Stragglers are cancelled; with
+    run_fetch / fetch_page_text that also stops their download at the next block.
+    Pages come back in the original rank order, not arrival order.
+    `on_page(rank, url, content, error)` is awaited as each fetch finishes.
+    URLs in `prefetched` (url -> text from the search provider) count as already scraped
+    and are only fetched for real if that text is not usable.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + plan.deadline_ms / 1000
+    got: List[Tuple[int, str, str]] = []
+    chars = 0
+    failed = 0
+
+    def satisfied() -> bool:
+        return len(got) >= plan.k or (plan.target_chars > 0 and chars >= plan.target_chars)
+
+    to_fetch: List[Tuple[int, str]] = []
+    from_provider = set()
+    for rank, u in enumerate(urls):
+        content = (prefetched or {}).get(u)
+        if is_usable(content):
+            got.append((rank, u, content))
+            chars += len(content)
+            from_provider.add(u)
+        else:
+            to_fetch.append((rank, u))
+
+    if satisfied():
+        to_fetch = []
+    tasks = {asyncio.ensure_future(fetch(u, plan.deadline_ms / 1000)): (rank, u) for rank, u in to_fetch}
+    pending = set(tasks)
+
+    while pending and not satisfied():
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            rank, url = tasks[task]
+            error = task.exception()
+            content = None if error else task.result()
+            if on_page is not None:
+                await on_page(rank, url, content, error)
+            if error is None and is_usable(content):
+                got.append((rank, url, content))
+                chars += len(content)
+            else:
+                failed += 1
+
+    for task in pending:
+        task.cancel()
+
+    # several fetches can finish in the same wakeup; keep the best-ranked k
+    got = sorted(got)[:plan.k]
+    meta = {
+        "candidates": len(urls),
+        "used": len(got),
+        "from_provider": sum(1 for _, u, _ in got if u in from_provider),
+        "fetched": len(tasks),
+        "failed": failed,
+        "cancelled": len(pending),
+        "deadline_hit": bool(pending) and not satisfied(),
+        "latency_ms": int((time.perf_counter() - t0) * 1000),
+    }
+    return [(url, content) for _, url, content in got], meta
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tools.tavily import _tavily_search
+from utils.env import get_env_variable
+from utils.executors import run_in
+
+SEARCH_PROVIDERS = [p.strip() for p in get_env_variable("SEARCH_PROVIDERS", "tavily").split(",") if p.strip()]
+SEARCH_BUDGET_MS = int(get_env_variable("SEARCH_BUDGET_MS", "8000"))
+# threads per provider; a provider that hangs past the budget can only tie up its own
+SEARCH_PROVIDER_WORKERS = int(get_env_variable("SEARCH_PROVIDER_WORKERS", "4"))
+RRF_K = 60
+
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+# fields where the longest value across providers wins when hits are merged
+_LONGEST_FIELDS = ("content", "raw_content")
+
+# monotonic time by which the current provider call must have answered (set by fan_out_search)
+_deadline: ContextVar[Optional[float]] = ContextVar("search_deadline", default=None)
+
+def remaining_s(default: float = 20) -> float:
+    """Seconds left in the search budget, for provider HTTP timeouts; `default` outside fan_out_search."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return max(0.1, deadline - time.monotonic())
+
+class SearchProvider:
+    """
+    A web search backend. search() is blocking and runs on the provider's own bounded thread pool;
+    HTTP calls should use remaining_s() as their timeout so they end with the budget.
+    """
+    name: str = ""
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Return hits best-first; each hit has at least a `url`."""
+        raise NotImplementedError
+
+    def search_response(self, query: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Hits plus the provider's other top-level response fields (e.g. Tavily's `answer`)."""
+        return self.search(query), {}
+
+class TavilyProvider(SearchProvider):
+    name = "tavily"
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        return self.search_response(query)[0]
+
+    def search_response(self, query: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        raw = _tavily_search(query, timeout=remaining_s()).get("raw") or {}
+        extra = {k: v for k, v in raw.items() if k not in ("results", "data")}
+        return list(raw.get("results") or raw.get("data") or []), extra
+
+PROVIDERS: Dict[str, SearchProvider] = {}
+
+def register_provider(provider: SearchProvider) -> None:
+    PROVIDERS[provider.name] = provider
+
+register_provider(TavilyProvider())
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def _executor(name: str) -> ThreadPoolExecutor:
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max(1, SEARCH_PROVIDER_WORKERS),
+                                                  thread_name_prefix=f"search-{name}")
+        return _executors[name]
+
+def canonical_url(url: str) -> str:
+    """Normalise a URL for de-duplication: host case, www., fragments, tracking params, trailing slash."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
+
+def _hit_url(hit: Dict[str, Any]) -> Optional[str]:
+    return hit.get("url") or hit.get("link")
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuse per-provider rankings: score(url) = sum over providers of 1 / (k + rank).
+    Hits for the same canonical URL are merged: the best-ranked copy keeps its fields,
+    except content fields, where the longest copy wins.
+    """
+    copies: Dict[str, List[Tuple[int, str, Dict[str, Any]]]] = {}
+    for provider, hits in ranked.items():
+        seen = set()
+        for rank, hit in enumerate(hits, start=1):
+            url = _hit_url(hit)
+            if not url:
+                continue
+            key = canonical_url(url)
+            if key in seen:
+                continue  # duplicate within one provider counts once
+            seen.add(key)
+            copies.setdefault(key, []).append((rank, provider, hit))
+
+    fused = []
+    for group in copies.values():
+        group.sort(key=lambda c: c[0])
+        best = group[0][2]
+        merged = {**best, "url": _hit_url(best)}
+        for field in _LONGEST_FIELDS:
+            longest = max((c[2].get(field) or "" for c in group), key=lambda v: len(str(v)))
+            if longest:
+                merged[field] = longest
+        merged["providers"] = [p for _, p, _ in group]
+        merged["rrf_score"] = sum(1.0 / (k + r) for r, _, _ in group)
+        fused.append(merged)
+    return sorted(fused, key=lambda h: h["rrf_score"], reverse=True)
+
+async def fan_out_search(query: str, providers: Optional[Sequence[str]] = None,
+                         budget_ms: int = SEARCH_BUDGET_MS) -> Tuple[Dict[str, Any], int]:
+    """
+    Query every configured provider in parallel and fuse whatever has answered when the
+    budget runs out; slower providers are abandoned. Each provider runs on its own bounded pool
+    with the budget as its HTTP timeout, so abandoned calls end soon after and cannot pile up
+    threads. Returns (raw, latency_ms) where raw is
+    {"query", "results", "providers": {name: {status, latency_ms, hits}}} plus the other
+    top-level fields of the first configured provider that answered (Tavily: answer, response_time, ...).
+    Raises only when no provider produced results.
+    """
+    names = [n for n in (providers or SEARCH_PROVIDERS) if n in PROVIDERS]
+    if not names:
+        raise ValueError(f"no known search providers in {list(providers or SEARCH_PROVIDERS)}")
+    t0 = time.perf_counter()
+    token = _deadline.set(time.monotonic() + budget_ms / 1000)
+
+    async def run(name: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        provider = PROVIDERS[name]
+        t = time.perf_counter()
+        # a call still queued for one of the provider's threads is dropped when the budget cancels it
+        if hasattr(provider, "search_response"):
+            hits, extra = await run_in(_executor(name), provider.search_response, query)
+        else:
+            hits, extra = await run_in(_executor(name), provider.search, query), {}
+        return hits, extra, int((time.perf_counter() - t) * 1000)
+
+    try:
+        tasks = {asyncio.ensure_future(run(n)): n for n in names}
+    finally:
+        _deadline.reset(token)
+
+    done, pending = await asyncio.wait(tasks, timeout=budget_ms / 1000)
+    for task in pending:
+        task.cancel()
+
+    ranked: Dict[str, List[Dict[str, Any]]] = {}
+    extras: Dict[str, Dict[str, Any]] = {}
+    status: Dict[str, Dict[str, Any]] = {}
+    errors: List[str] = []
+    for task, name in tasks.items():
+        if task in pending:
+            status[name] = {"status": "timeout"}
+        elif task.exception() is not None:
+            status[name] = {"status": "error", "error": repr(task.exception())}
+            errors.append(f"{name}: {task.exception()!r}")
+        else:
+            ranked[name], extras[name], provider_ms = task.result()
+            status[name] = {"status": "ok", "hits": len(ranked[name]), "latency_ms": provider_ms}
+    latency_ms = int((time.perf_counter() - t0) * 1000)
+
+    if not ranked:
+        raise RuntimeError(f"all search providers failed or timed out after {latency_ms} ms | {'; '.join(errors) or 'timeout'}")
+    primary = next(n for n in names if n in ranked)
+    raw = {**extras[primary], "query": query, "results": reciprocal_rank_fusion(ranked), "providers": status}
+    return raw, latency_ms
+
+def providers_label(raw: Dict[str, Any]) -> str:
+    """Providers that contributed results, e.g. 'tavily' or 'tavily+brave'."""
+    return "+".join(n for n, s in (raw.get("providers") or {}).items() if s.get("status") == "ok") or "tavily"
+
+def without_raw_content(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a search result without provider page text; that text is already in the summary input."""
+    hits = [{k: v for k, v in h.items() if k != "raw_content"} for h in raw.get("results") or []]
+    return {**raw, "results": hits}
@@ -1,81 +1,180 @@
+import asyncio
+import hashlib
+import json
+import math
 from typing import List, Dict, Any, Optional, Tuple
 from fastmcp import Context
 from tools.rewrite import rewrite_query
-from tools.scrape import get_webpage_content
-from tools.smart_search import _tavily_search
+from tools.scrape import fetch_page_text, run_fetch
+from services.scrape_service import FanoutPlan, is_usable, scrape_hedged
+from services.prefetch_service import PAGE_CACHE
+from services.search_service import SEARCH_BUDGET_MS, fan_out_search
 from tools.summarize import summarize_text
 from utils.sse import chunk_text
 from utils.state import STATE_STORE, SearchState, SearchTurn
 from utils.logger import log_event, report_progress
+from utils.admission import AdmissionRejected
+from utils.deadline import Deadline
+from utils.executors import GEMINI_EXECUTOR, run_in
+from utils.local_rewrite import REWRITE_LLM, REWRITE_LOCAL, REWRITE_LOCAL_FALLBACK, REWRITE_LOCAL_MIN_CONFIDENCE, local_rewrite
+from utils.loop_monitor import set_stage
+from utils.metrics import METRICS
+from utils.singleflight import SingleFlight
+
+# concurrent requests doing identical work share one upstream call per step
+REWRITE_FLIGHT = SingleFlight("rewrite")
+SEARCH_FLIGHT = SingleFlight("search")
+FETCH_FLIGHT = SingleFlight("fetch")
+SUMMARIZE_FLIGHT = SingleFlight("summarize")
+
+# share of the remaining deadline each stage may use; summarize gets whatever is left
+REWRITE_SHARE = 0.15
+SEARCH_SHARE = 0.25
+SCRAPE_SHARE = 0.4
+# a stage whose share falls below its minimum is degraded instead of run
+REWRITE_MIN_MS = 1000
+SEARCH_MIN_MS = 1000
+SCRAPE_MIN_MS = 500
+SUMMARY_MIN_MS = 3000
 
 async def step_load_state(session_id: str, ctx: Optional[Context]) -> SearchState:
+    set_stage("load_state")
     state = STATE_STORE.get(session_id) or SearchState(session_id=session_id)
     await log_event(ctx, "info", f"state loaded | recent_turns={len(state.turns)}", session_id=session_id)
     await report_progress(ctx, 3)
     return state
 
-async def step_rewrite(query: str, prefs: Dict[str, Any], ctx: Optional[Context]) -> Tuple[Optional[str], str]:
-    await log_event(ctx, "info", "rewriting query…")
+async def step_rewrite(query: str, prefs: Dict[str, Any], ctx: Optional[Context],
+                       deadline: Optional[Deadline] = None) -> Tuple[Optional[str], str, str]:
+    """
+    Returns (rewritten, use_query, rewrite_path). Keyword-shaped queries are rewritten
+    locally ("local"); the rest go to the LLM ("llm"). When the LLM is skipped, too slow
+    or fails, the local rewrite is used anyway ("local_fallback").
+    """
+    set_stage("rewrite")
+    deadline = deadline or Deadline()
+    local = local_rewrite(query, **prefs)
+    if local.confidence >= REWRITE_LOCAL_MIN_CONFIDENCE:
+        return await _rewrite_done(ctx, local.query, REWRITE_LOCAL, f"confidence={local.confidence}")
+
+    budget_ms = deadline.share_ms(REWRITE_SHARE)
+    if budget_ms is not None and budget_ms < REWRITE_MIN_MS:
+        deadline.degrade("rewrite_skipped")
+        await log_event(ctx, "warning", f"LLM rewrite skipped | {int(deadline.remaining_ms())} ms left")
+        return await _rewrite_done(ctx, local.query, REWRITE_LOCAL_FALLBACK)
+    await log_event(ctx, "info", f"rewriting query… (local confidence {local.confidence})")
     try:
-        rewritten = rewrite_query.invoke({"query": query, **prefs}).strip()
-        use_query = rewritten or query
-        await log_event(ctx, "info", f"rewrite done → {use_query}")
-        await report_progress(ctx, 15)
-        return rewritten, use_query
+        key = (" ".join(query.lower().split()), json.dumps(prefs, sort_keys=True, default=str))
+        call = REWRITE_FLIGHT.do(key, lambda: run_in(GEMINI_EXECUTOR, rewrite_query.invoke, {"query": query, **prefs}))
+        rewritten = (await asyncio.wait_for(call, None if budget_ms is None else budget_ms / 1000)).strip()
+        if not rewritten:
+            return await _rewrite_done(ctx, local.query, REWRITE_LOCAL_FALLBACK)
+        return await _rewrite_done(ctx, rewritten, REWRITE_LLM)
+    except asyncio.TimeoutError:
+        deadline.degrade("rewrite_timeout")
+        await log_event(ctx, "warning", f"rewrite over its {budget_ms} ms share, using the local rewrite")
+        return await _rewrite_done(ctx, local.query, REWRITE_LOCAL_FALLBACK)
     except Exception as e:
         await log_event(ctx, "warning", f"rewrite failed, fallback | {e!r}")
-        await report_progress(ctx, 15)
-        return None, query
+        return await _rewrite_done(ctx, local.query, REWRITE_LOCAL_FALLBACK)
 
-async def step_search(use_query: str, ctx: Optional[Context]) -> Tuple[Dict[str, Any], int]:
+async def _rewrite_done(ctx: Optional[Context], rewritten: str, path: str, detail: str = "") -> Tuple[str, str, str]:
+    METRICS.inc("rewrite_path_total", labels={"path": path})
+    await log_event(ctx, "info", f"rewrite done ({path}{', ' + detail if detail else ''}) → {rewritten}")
+    await report_progress(ctx, 15)
+    return rewritten, rewritten, path
+
+async def step_search(use_query: str, ctx: Optional[Context],
+                      deadline: Optional[Deadline] = None) -> Tuple[Dict[str, Any], int]:
+    set_stage("search")
+    deadline = deadline or Deadline()
+    # search results are the minimum useful answer, so search always runs
+    budget_ms = max(deadline.share_ms(SEARCH_SHARE, cap_ms=SEARCH_BUDGET_MS), SEARCH_MIN_MS)
     await log_event(ctx, "info", f"searching: {use_query}")
-    sr = _tavily_search(use_query)
-    raw = sr.get("raw")
-    latency_ms = sr.get("latency_ms")
-    await log_event(ctx, "info", f"search latency: {latency_ms} ms")
+    raw, latency_ms = await SEARCH_FLIGHT.do(" ".join(use_query.split()), lambda: fan_out_search(use_query, budget_ms=budget_ms))
+    per_provider = {n: s.get("latency_ms", s["status"]) for n, s in raw["providers"].items()}
+    await log_event(ctx, "info", f"search latency: {latency_ms} ms | providers={per_provider} | fused hits={len(raw['results'])}")
     await report_progress(ctx, 35)
     return raw, latency_ms
 
-def step_extract_urls(raw: Dict[str, Any]) -> List[str]:
+def step_extract_urls(raw: Dict[str, Any], limit: int = 3) -> List[str]:
     urls: List[str] = []
     if isinstance(raw, dict):
         hits = raw.get("results") or raw.get("data") or []
-        for h in hits[:3]:
+        for h in hits[:limit]:
             url = h.get("url") or h.get("link")
             if url:
                 urls.append(url)
     return urls
 
-async def step_scrape(urls: List[str], ctx: Optional[Context]) -> List[str]:
-    await log_event(ctx, "info", f"top URLs: {urls}")
+async def step_scrape(urls: List[str], ctx: Optional[Context], plan: Optional[FanoutPlan] = None,
+                      prefetched: Optional[Dict[str, str]] = None,
+                      deadline: Optional[Deadline] = None) -> Tuple[List[str], List[str], Dict[str, Any]]:
+    """
+    Hedged fan-out over the candidate URLs; returns (contents, used_urls, scrape_meta).
+    URLs in `prefetched` already have page text from the search provider and are not downloaded;
+    pages warmed by the prefetcher are served from PAGE_CACHE.
+    Short on time: the fan-out deadline shrinks to the stage's share, then fewer pages are
+    kept, and below SCRAPE_MIN_MS only provider content is used.
+    """
+    set_stage("scrape")
+    plan = plan or FanoutPlan()
+    deadline = deadline or Deadline()
+    budget_ms = deadline.share_ms(SCRAPE_SHARE, cap_ms=plan.deadline_ms)
+    if budget_ms is not None and budget_ms < plan.deadline_ms:
+        update: Dict[str, Any] = {"deadline_ms": max(budget_ms, 1)}
+        if budget_ms < plan.deadline_ms / 2 and plan.k > 1:
+            update["k"] = max(1, plan.k // 2)
+            deadline.degrade("fewer_pages")
+        if budget_ms < SCRAPE_MIN_MS:
+            deadline.degrade("scrape_skipped")
+            urls = [u for u in urls if u in (prefetched or {})]
+        plan = plan.model_copy(update=update)
+    await log_event(ctx, "info", f"candidate URLs: {urls} | keep={plan.k} | deadline={plan.deadline_ms} ms")
     await report_progress(ctx, 40)
-    scraped: List[str] = []
     if not urls:
         await log_event(ctx, "info", "no URLs to scrape")
-        return scraped
+        return [], [], {"candidates": 0, "used": 0, "from_provider": 0, "fetched": 0, "from_cache": 0}
+    for url, content in (prefetched or {}).items():
+        await log_event(ctx, "info", f"provider content: {url} | chars={len(content)}")
+
+    finished = 0
+    cache_hits = 0
 
-    per_url_step = 40 // max(1, len(urls))
-    base = 40
-    for i, url in enumerate(urls, start=1):
-        await log_event(ctx, "info", f"scraping [{i}/{len(urls)}]: {url}")
-        try:
-            content: str = get_webpage_content.invoke({"url": url}) or ""
-            if content:
-                scraped.append(content)
-                for j, chunk in enumerate(chunk_text(content, size=1200)):
-                    if j >= 3:
-                        await log_event(ctx, "debug", f"(truncated preview for {url})")
-                        break
-                    await log_event(ctx, "info", f"{url} · chunk {j+1}\n{chunk[:1200]}")
-                await log_event(ctx, "info", f"scraped {url} | chars={len(content)}")
-            else:
-                await log_event(ctx, "warning", f"empty content: {url}")
-        except Exception as e:
-            await log_event(ctx, "error", f"scrape failed: {url} | {e!r}")
-        await report_progress(ctx, min(base + i * per_url_step, 80))
-    return scraped
+    async def fetch(url: str, timeout: float) -> str:
+        nonlocal cache_hits
+        cached = PAGE_CACHE.get(url)
+        if cached is not None:
+            cache_hits += 1
+            return cached
+        return await FETCH_FLIGHT.do(url, lambda: run_fetch(fetch_page_text, url, timeout))
+
+    async def on_page(rank: int, url: str, content: Optional[str], error: Optional[BaseException]) -> None:
+        nonlocal finished
+        finished += 1
+        if error is not None:
+            await log_event(ctx, "error", f"scrape failed: {url} | {error!r}")
+        elif is_usable(content):
+            for j, chunk in enumerate(chunk_text(content, size=1200)):
+                if j >= 3:
+                    await log_event(ctx, "debug", f"(truncated preview for {url})")
+                    break
+                await log_event(ctx, "info", f"{url} · chunk {j+1}\n{chunk[:1200]}", client_level="debug")
+            await log_event(ctx, "info", f"scraped [{rank+1}] {url} | chars={len(content)}")
+        else:
+            await log_event(ctx, "warning", f"unusable content: {url} | {(content or '')[:120]!r}")
+        await report_progress(ctx, min(40 + finished * 40 // len(urls), 80))
+
+    pages, meta = await scrape_hedged(urls, fetch, plan, on_page, prefetched=prefetched)
+    meta["from_cache"] = cache_hits
+    await log_event(ctx, "info", f"pages: {meta['from_provider']} from provider, {meta['fetched']} fetched ({cache_hits} from cache)")
+    if meta["cancelled"]:
+        await log_event(ctx, "info", f"kept {meta['used']} pages, cancelled {meta['cancelled']} slower fetches | {meta['latency_ms']} ms")
+    await report_progress(ctx, 80)
+    return [c for _, c in pages], [u for u, _ in pages], meta
 
 def step_combine(state: SearchState, scraped: List[str]) -> str:
+    set_stage("combine")
     historical = "\n\n".join(
         t.original_query + " → " + (t.rewritten_query or t.original_query)
         for t in state.turns[-3:]
@@ -85,23 +184,45 @@ def step_combine(state: SearchState, scraped: List[str]) -> str:
         combined = f"Previous search context:\n{historical}\n\nCurrent content:\n{combined}"
     return combined
 
-async def step_summarize(combined: str, query: str, target_language: Optional[str], ctx: Optional[Context]) -> Optional[str]:
+async def step_summarize(combined: str, query: str, target_language: Optional[str], ctx: Optional[Context],
+                         deadline: Optional[Deadline] = None) -> Optional[str]:
+    set_stage("summarize")
+    deadline = deadline or Deadline()
+    remaining_ms = deadline.remaining_ms()
+    if remaining_ms < SUMMARY_MIN_MS:
+        deadline.degrade("summary_skipped")
+        await log_event(ctx, "warning", f"summary skipped | {int(remaining_ms)} ms left")
+        await report_progress(ctx, 92)
+        return None
     await log_event(ctx, "info", "summarizing…")
     try:
-        summary = summarize_text.invoke({
+        payload = {
             "text": combined,
             "max_words": 250,
             "language": target_language,
             "style": "balanced",
             "include_bullets": True,
             "title": query
-        })
+        }
+        key = (hashlib.sha1(combined.encode("utf-8")).hexdigest(), query, target_language)
+        call = SUMMARIZE_FLIGHT.do(key, lambda: run_in(GEMINI_EXECUTOR, summarize_text.invoke, payload))
+        # summarize_text itself drops chunks it has no time for (see current_deadline)
+        summary = await asyncio.wait_for(call, None if math.isinf(remaining_ms) else remaining_ms / 1000)
         if isinstance(summary, str) and summary:
             for k, c in enumerate(chunk_text(summary, size=800)):
-                await log_event(ctx, "info", f"summary chunk {k+1}:\n{c}")
+                await log_event(ctx, "info", f"summary chunk {k+1}:\n{c}", client_level="debug")
         await log_event(ctx, "info", "summary done")
         await report_progress(ctx, 92)
         return summary
+    except asyncio.TimeoutError:
+        deadline.degrade("summary_timeout")
+        await log_event(ctx, "warning", "summary ran out of time; returning search results only")
+        await report_progress(ctx, 92)
+        return None
+    except AdmissionRejected as e:
+        await log_event(ctx, "warning", f"summary skipped (load shedding) | {e}")
+        await report_progress(ctx, 92)
+        return None
     except Exception as e:
         await log_event(ctx, "error", f"summary failed | {e!r}")
         await report_progress(ctx, 92)
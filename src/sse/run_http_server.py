@@ -1,22 +1,55 @@
-import json
+from contextlib import asynccontextmanager
 from typing import List, Optional
 from fastmcp import FastMCP, Context
-from tools.smart_search import smart_search, smart_search_stream_mcp
+from fastmcp.server.middleware import Middleware
+from tools.smart_search import smart_search_batch_mcp, smart_search_stream_mcp, submit_search_mcp
 from tools.tavily import tavily_search
 from tools.rewrite import rewrite_query
 from tools.summarize import summarize_text
+from db.writer import LOG_WRITER, TURN_WRITER
+from services.job_service import JOBS
+from services.prefetch_service import PREFETCHER
+from utils.loop_monitor import LOOP_MONITOR, LOOP_MONITOR_ENABLED
+from utils.metrics import METRICS
+from utils.notify import Notifier
 
-mcp = FastMCP("ResearchTools")
+@asynccontextmanager
+async def lifespan(server):
+    if LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start()
+    try:
+        yield
+    finally:
+        await JOBS.shutdown()
+        # rows still buffered would be lost with the process; jobs above may have added some
+        await LOG_WRITER.flush()
+        await TURN_WRITER.flush()
+        LOOP_MONITOR.stop()
+
+# ops calls and job polling are not user work and must not cancel speculative prefetches
+BACKGROUND_TOOLS = {"server_metrics", "get_job", "watch_job", "cancel_job"}
+
+class ForegroundMiddleware(Middleware):
+    """Any user-facing tool call cancels speculative prefetches so they never compete with it."""
+
+    async def on_call_tool(self, context, call_next):
+        if context.message.name not in BACKGROUND_TOOLS:
+            PREFETCHER.cancel_all()
+        return await call_next(context)
+
+mcp = FastMCP("ResearchTools", lifespan=lifespan, middleware=[ForegroundMiddleware()])
 
 @mcp.tool(
     name="smart_search",
     description=(
         "One-shot research with stateful rewriting and meta search. "
-        "Args: session_id, query, prefer_academic, time_range, extra_sites, filetype_pdf, target_language."
+        "Args: session_id, query, prefer_academic, time_range, extra_sites, filetype_pdf, target_language, "
+        "scrape_k, scrape_extra, scrape_deadline_ms, "
+        "deadline_ms (overall budget; the response lists any degradations applied to meet it)."
     ),
     tags={"search", "web", "rewrite"}
 )
-def smart_search_tool(
+async def smart_search_tool(
     session_id: str,
     query: str,
     prefer_academic: Optional[bool] = None,
@@ -24,24 +57,26 @@ def smart_search_tool(
     extra_sites: Optional[List[str]] = None,
     filetype_pdf: Optional[bool] = None,
     target_language: Optional[str] = None,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    deadline_ms: Optional[int] = None,
 ) -> dict:
     """One-shot search with state; returns structured JSON."""
-    payload = {
-        "session_id": session_id,
-        "query": query,
-        "prefer_academic": prefer_academic,
-        "time_range": time_range,
-        "extra_sites": extra_sites,
-        "filetype_pdf": filetype_pdf,
-        "target_language": target_language,
-    }
-    out = smart_search.invoke(payload)
-    if isinstance(out, str):
-        try:
-            return json.loads(out)
-        except Exception:
-            return {"raw": out}
-    return out
+    # same pipeline as smart_search_stream, without client notifications
+    return await smart_search_stream_mcp(
+        session_id=session_id,
+        query=query,
+        prefer_academic=prefer_academic,
+        time_range=time_range,
+        extra_sites=extra_sites,
+        filetype_pdf=filetype_pdf,
+        target_language=target_language,
+        scrape_k=scrape_k,
+        scrape_extra=scrape_extra,
+        scrape_deadline_ms=scrape_deadline_ms,
+        deadline_ms=deadline_ms,
+    )
 
 @mcp.tool(
     name="tavily_search",
@@ -58,12 +93,14 @@ def tavily_search_tool(query: str):
     name="summarize_text",
     description=(
         "Summarize long text using Gemini 2.5. "
-        "Args: text, max_words, language, style, include_bullets, title."
+        "Args: text or source (local path / file:// URI / http(s) URL of a large document on an allow-listed "
+        "directory or host, streamed instead of sent inline), max_words, language, style, include_bullets, title."
     ),
     tags={"summarize", "gemini", "text"}
 )
 def summarize_text_tool(
-    text: str,
+    text: Optional[str] = None,
+    source: Optional[str] = None,
     max_words: int = 200,
     language: Optional[str] = None,
     style: Optional[str] = "balanced",
@@ -72,6 +109,7 @@ def summarize_text_tool(
 ) -> str:
     return summarize_text.invoke({
         "text": text,
+        "source": source,
         "max_words": max_words,
         "language": language,
         "style": style,
@@ -108,7 +146,9 @@ def rewrite_query_tool(
     name="smart_search_stream",
     description=(
         "Stateful meta-search with live progress/log streaming over MCP. "
-        "Args: session_id, query, prefer_academic, time_range, extra_sites, filetype_pdf, target_language."
+        "Args: session_id, query, prefer_academic, time_range, extra_sites, filetype_pdf, target_language, "
+        "scrape_k, scrape_extra, scrape_deadline_ms, deadline_ms (overall budget), "
+        "verbosity ('quiet' = progress + final result only, 'normal', 'verbose' = include content previews)."
     ),
     tags={"search", "web", "rewrite", "stream"},
 )
@@ -120,6 +160,11 @@ async def smart_search_stream_tool(
     extra_sites: Optional[List[str]] = None,
     filetype_pdf: Optional[bool] = None,
     target_language: Optional[str] = None,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    deadline_ms: Optional[int] = None,
+    verbosity: Optional[str] = "normal",
     ctx: Context = None,  
 ):
     out = await smart_search_stream_mcp(
@@ -130,6 +175,147 @@ async def smart_search_stream_tool(
         extra_sites=extra_sites,
         filetype_pdf=filetype_pdf,
         target_language=target_language,
+        scrape_k=scrape_k,
+        scrape_extra=scrape_extra,
+        scrape_deadline_ms=scrape_deadline_ms,
+        deadline_ms=deadline_ms,
+        verbosity=verbosity,
         ctx=ctx,
     )
     return out 
+
+
+@mcp.tool(
+    name="smart_search_batch",
+    description=(
+        "Run many related research queries at once with bounded concurrency. "
+        "Identical rewrites, searches and page fetches are shared across the batch; "
+        "each result is streamed back as soon as its query completes. "
+        "Args: queries, session_id (shared) or session_ids (one per query), prefer_academic, time_range, "
+        "extra_sites, filetype_pdf, target_language, max_concurrency, scrape_k, scrape_extra, scrape_deadline_ms."
+    ),
+    tags={"search", "web", "rewrite", "stream", "batch"},
+)
+async def smart_search_batch_tool(
+    queries: List[str],
+    session_id: Optional[str] = None,
+    session_ids: Optional[List[str]] = None,
+    prefer_academic: Optional[bool] = None,
+    time_range: Optional[str] = None,
+    extra_sites: Optional[List[str]] = None,
+    filetype_pdf: Optional[bool] = None,
+    target_language: Optional[str] = None,
+    max_concurrency: int = 4,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    ctx: Context = None,
+):
+    out = await smart_search_batch_mcp(
+        queries=queries,
+        session_id=session_id,
+        session_ids=session_ids,
+        prefer_academic=prefer_academic,
+        time_range=time_range,
+        extra_sites=extra_sites,
+        filetype_pdf=filetype_pdf,
+        target_language=target_language,
+        max_concurrency=max_concurrency,
+        scrape_k=scrape_k,
+        scrape_extra=scrape_extra,
+        scrape_deadline_ms=scrape_deadline_ms,
+        ctx=ctx,
+    )
+    return out
+
+@mcp.tool(
+    name="submit_search",
+    description=(
+        "Queue a long research call and return a job_id immediately; the same pipeline as smart_search "
+        "runs on a bounded worker pool. Poll with get_job or follow progress with watch_job. "
+        "Args: the smart_search args, plus priority ('high', 'normal', 'low'). "
+        "deadline_ms counts from when the job starts, not from submission."
+    ),
+    tags={"search", "web", "rewrite", "jobs"},
+)
+async def submit_search_tool(
+    session_id: str,
+    query: str,
+    prefer_academic: Optional[bool] = None,
+    time_range: Optional[str] = None,
+    extra_sites: Optional[List[str]] = None,
+    filetype_pdf: Optional[bool] = None,
+    target_language: Optional[str] = None,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    deadline_ms: Optional[int] = None,
+    priority: str = "normal",
+) -> dict:
+    return await submit_search_mcp(
+        session_id=session_id,
+        query=query,
+        prefer_academic=prefer_academic,
+        time_range=time_range,
+        extra_sites=extra_sites,
+        filetype_pdf=filetype_pdf,
+        target_language=target_language,
+        scrape_k=scrape_k,
+        scrape_extra=scrape_extra,
+        scrape_deadline_ms=scrape_deadline_ms,
+        deadline_ms=deadline_ms,
+        priority=priority,
+    )
+
+@mcp.tool(
+    name="get_job",
+    description=(
+        "Status, progress and recent log of a submitted job; includes the result once it is done. "
+        "Finished jobs are kept for JOB_RESULT_TTL_S seconds. Args: job_id."
+    ),
+    tags={"jobs"},
+)
+def get_job_tool(job_id: str) -> dict:
+    return JOBS.get(job_id).snapshot()
+
+@mcp.tool(
+    name="watch_job",
+    description=(
+        "Subscribe to a job: streams its log lines and progress as notifications until it finishes "
+        "or wait_s passes, then returns the same payload as get_job. "
+        "Args: job_id, wait_s, verbosity ('quiet' = progress only, 'normal')."
+    ),
+    tags={"jobs", "stream"},
+)
+async def watch_job_tool(
+    job_id: str,
+    wait_s: float = 60,
+    verbosity: Optional[str] = "normal",
+    ctx: Context = None,
+) -> dict:
+    notifier = Notifier(ctx, verbosity) if ctx is not None else None
+    try:
+        job = await JOBS.watch(job_id, notifier, wait_s)
+    finally:
+        if notifier is not None:
+            await notifier.flush()
+    return job.snapshot()
+
+@mcp.tool(
+    name="cancel_job",
+    description="Cancel a queued or running job. Args: job_id.",
+    tags={"jobs"},
+)
+def cancel_job_tool(job_id: str) -> dict:
+    return JOBS.cancel(job_id).snapshot(include_result=False)
+
+@mcp.tool(
+    name="server_metrics",
+    description=(
+        "In-process server metrics: admission queue depth, in-flight calls, queue wait histograms, "
+        "shed counts per dependency, event-loop lag and recent loop stalls with their stacks."
+    ),
+    tags={"metrics", "ops"},
+)
+def server_metrics_tool() -> dict:
+    return {**METRICS.snapshot(), "loop_stalls": LOOP_MONITOR.recent()}
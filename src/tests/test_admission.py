@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from utils.admission import PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionRejected, FairLimiter, admission_scope
+
+
+def _queue(limiter, session_id, priority, order):
+    def run():
+        with admission_scope(session_id, priority):
+            with limiter.slot():
+                order.append(session_id)
+    t = threading.Thread(target=run)
+    t.start()
+    time.sleep(0.02)  # make enqueue order deterministic
+    return t
+
+
+def test_round_robin_across_sessions_and_interactive_first():
+    limiter = FairLimiter("test", limit=1, max_wait_s=5)
+    order = []
+    limiter.acquire()
+    threads = [
+        _queue(limiter, "busy", PRIORITY_INTERACTIVE, order),
+        _queue(limiter, "busy", PRIORITY_INTERACTIVE, order),
+        _queue(limiter, "busy", PRIORITY_INTERACTIVE, order),
+        _queue(limiter, "batch", PRIORITY_BATCH, order),
+        _queue(limiter, "other", PRIORITY_INTERACTIVE, order),
+    ]
+    limiter.release()
+    for t in threads:
+        t.join(2)
+    assert order == ["busy", "other", "busy", "busy", "batch"]
+
+
+def test_sheds_after_queue_deadline():
+    limiter = FairLimiter("test", limit=1, max_wait_s=0.05)
+    limiter.acquire()
+    with pytest.raises(AdmissionRejected, match="test is overloaded"):
+        limiter.acquire()
+    limiter.release()
+    with limiter.slot():
+        pass
+
+
+def test_queued_gemini_calls_do_not_starve_the_default_executor():
+    import asyncio
+
+    from utils.executors import GEMINI_EXECUTOR, run_in
+
+    limiter = FairLimiter("test", limit=1, max_wait_s=1)
+    limiter.acquire()
+
+    def gemini_call():
+        with limiter.slot():
+            pass
+
+    async def main():
+        # far more queued LLM calls than the default executor has threads
+        backlog = [asyncio.ensure_future(run_in(GEMINI_EXECUTOR, gemini_call)) for _ in range(40)]
+        await asyncio.sleep(0.05)
+        t0 = time.perf_counter()
+        await asyncio.to_thread(lambda: None)
+        fetch_wait = time.perf_counter() - t0
+        limiter.release()
+        await asyncio.gather(*backlog, return_exceptions=True)
+        return fetch_wait
+
+    assert asyncio.run(main()) < 0.2
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+import db.writer as writer
+from utils.background_loop import BackgroundLoop
+
+
+def test_sync_calls_share_one_loop_and_writer_keeps_flushing(monkeypatch):
+    batches = []
+
+    async def fake_bulk_insert(model, rows):
+        batches.append([r["message"] for r in rows])
+        return len(rows)
+
+    monkeypatch.setattr(writer, "bulk_insert", fake_bulk_insert)
+    w = writer.BulkWriter("MCPLog", batch_size=10, flush_interval_s=0.02, max_buffer=100)
+    monkeypatch.setattr(w, "_model", lambda: object())
+    bg = BackgroundLoop("test-loop")
+
+    async def call(message):
+        w.add({"message": message})
+        return asyncio.get_running_loop()
+
+    # the writer's flush task outlives the call that started it
+    first, second = bg.run(call("a")), bg.run(call("b"))
+    assert first is second and not first.is_closed()
+    time.sleep(0.1)
+    assert batches == [["a", "b"]]
+
+    # another loop can still use the writer afterwards
+    async def other():
+        w.add({"message": "c"})
+        await asyncio.sleep(0.1)
+
+    asyncio.run(other())
+    assert batches == [["a", "b"], ["c"]]
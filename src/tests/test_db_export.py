@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from db.export import parse_ts, write_batches
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _turn(i, **meta):
+    return {
+        "id": uuid.uuid4(),
+        "ts": datetime(2025, 9, 1, 12, i, tzinfo=timezone.utc),
+        "session_id": "s1",
+        "original_query": f"q{i}",
+        "rewritten_query": None,
+        "used_query": f"q{i}",
+        "provider": "tavily",
+        "inferred_prefs": {"prefer_academic": True, "extra_sites": ["europa.eu"], "target_language": "en"},
+        "result_meta": {"latency_ms": 120 + i, "top_urls": ["https://a"], "summary": "abc",
+                        "models": {"merge": "gemini-2.5-pro"}, "scrape": {"used": 3, "deadline_hit": False}, **meta},
+    }
+
+
+def test_search_turns_flatten_into_typed_columns(tmp_path):
+    out = tmp_path / "turns.parquet"
+    batches = iter([[_turn(0), _turn(1)], [], [_turn(2, batch_id="b1")]])
+
+    info = write_batches("search_turns", batches, str(out))
+
+    assert info["rows"] == 3 and info["batches"] == 2
+    table = pq.read_table(out)
+    assert str(table.schema.field("latency_ms").type) == "int64"
+    assert str(table.schema.field("ts").type) == "timestamp[us, tz=UTC]"
+    assert table.column("extra_sites").to_pylist()[0] == ["europa.eu"]
+    assert table.column("model_merge").to_pylist() == ["gemini-2.5-pro"] * 3
+    assert table.column("summary_chars").to_pylist() == [3, 3, 3]
+    assert table.column("batch_id").to_pylist() == [None, None, "b1"]
+    assert table.column("scrape_fetched").to_pylist() == [None, None, None]
+
+
+def test_logs_export_as_arrow_ipc(tmp_path):
+    import pyarrow as pa
+
+    out = tmp_path / "logs.arrow"
+    rows = [{"id": uuid.uuid4(), "ts": datetime.now(timezone.utc), "session_id": "s1", "request_id": "r1",
+             "level": "info", "message": "hello", "meta": {"k": 1}}]
+    write_batches("mcp_logs", [rows], str(out), fmt="arrow")
+
+    table = pa.ipc.open_file(str(out)).read_all()
+    assert table.column("meta").to_pylist() == ['{"k": 1}']
+
+
+def test_since_until_without_an_offset_are_utc():
+    assert parse_ts("2025-09-01") == datetime(2025, 9, 1, tzinfo=timezone.utc)
+    assert parse_ts("2025-09-01T07:00:00+07:00") == datetime(2025, 9, 1, tzinfo=timezone.utc)
+    assert parse_ts("2025-09-01T07:00:00+07:00").utcoffset() == timedelta(hours=7)
@@ -0,0 +1,46 @@
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+# db.sqlalchemy builds its engine at import; nothing here connects
+os.environ.setdefault("SUPABASE_DB_URL", "sqlite://")
+
+from db.queries import _page_query, decode_cursor, encode_cursor  # noqa: E402
+from db.retention import _delete_batch  # noqa: E402
+from models import MCPLog  # noqa: E402
+
+
+def _sql(stmt):
+    # newer SQLAlchemy adds ::TYPE casts to bound parameters and varies whitespace
+    sql = re.sub(r"::[A-Z]+( WITH TIME ZONE)?", "", str(stmt.compile(dialect=postgresql.dialect())))
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def test_cursor_round_trips_with_microseconds_and_offsets():
+    row_id = uuid.uuid4()
+    for ts in (datetime(2025, 9, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+               datetime(2025, 9, 1, 19, 0, tzinfo=timezone(timedelta(hours=7)))):
+        assert decode_cursor(encode_cursor(ts, row_id)) == (ts, row_id)
+        assert decode_cursor(encode_cursor(ts, row_id))[0].utcoffset() == ts.utcoffset()
+
+
+def test_keyset_page_compares_ts_and_id_together():
+    ts, row_id = datetime(2025, 9, 1, tzinfo=timezone.utc), uuid.uuid4()
+    sql = _sql(_page_query(MCPLog, "s1", 50, encode_cursor(ts, row_id), [MCPLog.level == "error"]))
+    assert "WHERE mcp_logs.session_id = %(session_id_1)s AND mcp_logs.level = %(level_1)s" in sql
+    assert "AND (mcp_logs.ts, mcp_logs.id) < (%(param_1)s, %(param_2)s)" in sql
+    assert sql.endswith("ORDER BY mcp_logs.ts DESC, mcp_logs.id DESC LIMIT %(param_3)s")
+    assert _page_query(MCPLog, "s1", 50, None, []).compile().params["param_1"] == 51
+
+
+def test_retention_deletes_one_unordered_batch_by_id():
+    cutoff = datetime(2025, 9, 1, tzinfo=timezone.utc)
+    stmt = _delete_batch(MCPLog, cutoff, 500)
+    sql = _sql(stmt)
+    assert sql == ("DELETE FROM mcp_logs WHERE mcp_logs.id IN "
+                   "(SELECT mcp_logs.id FROM mcp_logs WHERE mcp_logs.ts < %(ts_1)s LIMIT %(param_1)s)")
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert params == {"ts_1": cutoff, "param_1": 500}
@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import db.sqlalchemy_async as sqlalchemy_async
+import db.writer as writer
+from utils.metrics import MetricsRegistry
+
+
+def test_rows_are_flushed_in_multi_row_batches(monkeypatch):
+    batches = []
+
+    async def fake_bulk_insert(model, rows):
+        batches.append(list(rows))
+        return len(rows)
+
+    monkeypatch.setattr(writer, "bulk_insert", fake_bulk_insert)
+    w = writer.BulkWriter("MCPLog", batch_size=4, flush_interval_s=0.01, max_buffer=100)
+    monkeypatch.setattr(w, "_model", lambda: object())
+
+    async def main():
+        for i in range(10):
+            w.add({"message": str(i)})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert [r["message"] for b in batches for r in b] == [str(i) for i in range(10)]
+
+
+def test_transient_failures_are_retried_and_threads_wake_the_owner(monkeypatch):
+    batches, failures = [], [OSError("connection reset")]
+
+    async def flaky_bulk_insert(model, rows):
+        if failures:
+            raise failures.pop()
+        batches.append(list(rows))
+        return len(rows)
+
+    monkeypatch.setattr(writer, "bulk_insert", flaky_bulk_insert)
+    monkeypatch.setattr(writer, "WRITER_RETRY_BACKOFF_S", 0.001)
+    w = writer.BulkWriter("MCPLog", batch_size=10, flush_interval_s=0.01, max_buffer=100)
+    monkeypatch.setattr(w, "_model", lambda: object())
+
+    async def main():
+        w.add({"message": "loop"})
+        await asyncio.sleep(0.05)
+        # a worker thread has no running loop; its row must still be flushed
+        await asyncio.to_thread(w.add, {"message": "thread"})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert [r["message"] for b in batches for r in b] == ["loop", "thread"]
+
+
+def _writer(monkeypatch, insert, **kw):
+    metrics = MetricsRegistry()
+    monkeypatch.setattr(writer, "METRICS", metrics)
+    monkeypatch.setattr(writer, "bulk_insert", insert)
+    monkeypatch.setattr(writer, "WRITER_RETRY_BACKOFF_S", 0.001)
+    w = writer.BulkWriter("MCPLog", **{"batch_size": 10, "flush_interval_s": 0.01, "max_buffer": 100, **kw})
+    monkeypatch.setattr(w, "_model", lambda: object())
+    return w, metrics.snapshot
+
+
+def test_retries_stop_at_the_limit_and_permanent_errors_are_not_retried(monkeypatch):
+    calls = []
+
+    async def failing_bulk_insert(model, rows):
+        calls.append(rows[0]["message"])
+        if rows[0]["message"] == "bad":
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    w, snapshot = _writer(monkeypatch, failing_bulk_insert, batch_size=1)
+    w.max_retries = 2
+    w.add({"message": "down"})
+    w.add({"message": "bad"})
+    asyncio.run(w.flush())
+
+    assert calls == ["down"] * 3 + ["bad"]
+    counters = snapshot()["counters"]
+    assert counters["db_writer_retries_total"] == {"table=MCPLog": 2}
+    assert counters["db_writer_failed_total"] == {"table=MCPLog": 2}
+    assert "db_writer_rows_total" not in counters
+
+
+def test_full_buffer_drops_the_oldest_rows(monkeypatch):
+    batches = []
+
+    async def fake_bulk_insert(model, rows):
+        batches.append([r["message"] for r in rows])
+        return len(rows)
+
+    w, snapshot = _writer(monkeypatch, fake_bulk_insert, max_buffer=3)
+    for i in range(5):
+        w.add({"message": str(i)})  # no loop yet: rows wait for flush()
+    asyncio.run(w.flush())
+
+    assert batches == [["2", "3", "4"]]
+    assert snapshot()["counters"]["db_writer_dropped_total"] == {"table=MCPLog": 2}
+
+
+def test_bulk_insert_sends_all_rows_in_one_statement(monkeypatch):
+    executed = []
+
+    class Conn:
+        async def execute(self, stmt, params):
+            executed.append((stmt, params))
+
+    class Begin:
+        async def __aenter__(self):
+            return Conn()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    engine = SimpleNamespace(begin=Begin)
+
+    async def get_engine():
+        return engine
+
+    monkeypatch.setattr(sqlalchemy_async, "get_async_engine", get_engine)
+    table = Table("mcp_logs", MetaData(), Column("id", Integer, primary_key=True), Column("message", String))
+    model = SimpleNamespace(__table__=table)
+    rows = [{"message": "a"}, {"message": "b"}]
+
+    assert asyncio.run(sqlalchemy_async.bulk_insert(model, rows)) == 2
+    assert asyncio.run(sqlalchemy_async.bulk_insert(model, [])) == 0
+    [(stmt, params)] = executed
+    assert str(stmt) == "INSERT INTO mcp_logs (id, message) VALUES (:id, :message)"
+    assert params == rows
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import services.search_service as search_service
+import services.smart_search_service as smart_search_service
+import tools.summarize as summarize
+from tools.smart_search import smart_search_stream_mcp
+from utils.deadline import Deadline, deadline_scope
+
+
+def _stub_pipeline(monkeypatch, calls):
+    def rewrite(payload):
+        calls["rewrite"] += 1
+        return "rewritten"
+
+    def search(query):
+        calls["search"] += 1
+        return [{"url": f"https://{i}.com"} for i in range(5)]
+
+    def fetch(url, timeout):
+        calls["fetch"] += 1
+        return "page text " * 50
+
+    def summarize_text(payload):
+        calls["summarize"] += 1
+        return "summary"
+
+    monkeypatch.setattr(smart_search_service, "rewrite_query", SimpleNamespace(invoke=rewrite))
+    monkeypatch.setitem(search_service.PROVIDERS, "tavily", SimpleNamespace(name="tavily", search=search))
+    monkeypatch.setattr(smart_search_service, "fetch_page_text", fetch)
+    monkeypatch.setattr(smart_search_service, "summarize_text", SimpleNamespace(invoke=summarize_text))
+
+
+def test_tight_deadline_degrades_instead_of_overrunning(monkeypatch):
+    calls = Counter()
+    _stub_pipeline(monkeypatch, calls)
+
+    out = asyncio.run(smart_search_stream_mcp(session_id="dl-1", query="tight", deadline_ms=2500))
+
+    degraded = out["state_meta"]["deadline"]["degraded"]
+    assert degraded == ["rewrite_skipped", "fewer_pages", "summary_skipped"]
+    assert calls["rewrite"] == 0 and calls["summarize"] == 0
+    assert out["used_query"] == "tight" and out["summary"] is None
+    assert out["result"]["results"] and out["state_meta"]["scrape"]["used"] == 1
+
+
+def test_no_deadline_runs_every_stage(monkeypatch):
+    calls = Counter()
+    _stub_pipeline(monkeypatch, calls)
+
+    out = asyncio.run(smart_search_stream_mcp(session_id="dl-2", query="relaxed", deadline_ms=0))
+
+    meta = out["state_meta"]["deadline"]
+    assert meta["budget_ms"] is None and meta["degraded"] == []
+    assert out["summary"] == "summary" and out["used_query"] == "rewritten"
+    assert out["state_meta"]["scrape"]["used"] == 3
+
+
+def test_summarize_drops_chunks_it_has_no_time_for(monkeypatch):
+    def chunk(ch, *args):
+        time.sleep(0.3)
+        return "part"
+
+    monkeypatch.setattr(summarize, "_summarize_chunk", chunk)
+    monkeypatch.setattr(summarize, "_merge_summaries", lambda parts, *args: f"{len(parts)} parts")
+
+    deadline = Deadline(summarize.MERGE_RESERVE_MS + 500)
+    with deadline_scope(deadline):
+        out = summarize.summarize_text.invoke({"text": "x" * (summarize.CHUNK_SIZE * 5)})
+
+    assert out == "2 parts"
+    assert deadline.degraded == ["fewer_chunks"]
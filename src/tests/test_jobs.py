@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+import services.job_service as job_service
+import tools.smart_search as smart_search
+from services.job_service import JobQueue, JobQueueFull
+
+
+def test_burst_runs_by_priority_on_a_bounded_pool():
+    started, running, peak = [], [], []
+
+    def job(name, gate=None):
+        async def run(reporter):
+            started.append(name)
+            running.append(name)
+            peak.append(len(running))
+            await reporter.info(f"{name} working")
+            await reporter.report_progress(50)
+            await (gate.wait() if gate else asyncio.sleep(0.01))
+            running.remove(name)
+            return {"name": name}
+        return run
+
+    async def main():
+        jobs = JobQueue(workers=2, max_queued=20, ttl_s=60)
+        gate = asyncio.Event()
+        blockers = [jobs.submit("t", job(f"block{i}", gate)) for i in range(2)]
+        await asyncio.sleep(0.01)
+        low = [jobs.submit("t", job(f"low{i}"), priority="low") for i in range(8)]
+        high = jobs.submit("t", job("high"), priority="high")
+        doomed = jobs.submit("t", job("doomed"))
+        assert jobs.queued == 10
+        jobs.cancel(doomed.id)
+        gate.set()
+        for j in blockers + low + [high]:
+            await jobs.watch(j.id, wait_s=5)
+        await jobs.shutdown()
+        return blockers, low, high, doomed
+
+    blockers, low, high, doomed = asyncio.run(main())
+    assert max(peak) == 2
+    assert started[2] == "high" and "doomed" not in started
+    assert all(j.status == "done" and j.progress == 100 for j in blockers + low + [high])
+    assert high.snapshot()["result"] == {"name": "high"}
+    assert high.snapshot()["recent_log"] == ["[info] high working"]
+    assert doomed.status == "cancelled"
+
+
+def test_cancel_running_full_queue_and_ttl():
+    async def forever(reporter):
+        await asyncio.sleep(60)
+
+    async def main():
+        jobs = JobQueue(workers=1, max_queued=1, ttl_s=0)
+        running = jobs.submit("t", forever)
+        await asyncio.sleep(0.01)
+        assert running.status == "running"
+        jobs.submit("t", forever)
+        with pytest.raises(JobQueueFull):
+            jobs.submit("t", forever)
+        jobs.cancel(running.id)
+        await jobs.watch(running.id, wait_s=1)
+        assert running.status == "cancelled"
+        await asyncio.sleep(0.01)
+        with pytest.raises(ValueError):
+            jobs.get(running.id)  # expired
+        await jobs.shutdown()
+
+    asyncio.run(main())
+
+
+def test_submit_search_returns_at_once_and_watch_streams_progress(monkeypatch):
+    async def pipeline(args, ctx, admission_priority):
+        await ctx.info(f"searching {args.query}")
+        await ctx.report_progress(40)
+        await asyncio.sleep(0.05)
+        await ctx.report_progress(100)
+        return {"summary": args.query, "admission_priority": admission_priority}
+
+    class Ctx:
+        def __init__(self):
+            self.events = []
+
+        async def info(self, message):
+            self.events.append(message)
+
+        async def report_progress(self, progress, total=100):
+            self.events.append(progress)
+
+    jobs = JobQueue(workers=1, max_queued=10, ttl_s=60)
+    monkeypatch.setattr(smart_search, "_smart_search_pipeline", pipeline)
+    monkeypatch.setattr(smart_search, "JOBS", jobs)
+
+    async def main():
+        out = await smart_search.submit_search_mcp(session_id="s", query="slow topic", priority="high")
+        assert out["status"] == "queued"
+        ctx = Ctx()
+        job = await jobs.watch(out["job_id"], ctx, wait_s=5)
+        await jobs.shutdown()
+        return job, ctx
+
+    job, ctx = asyncio.run(main())
+    assert job.snapshot()["result"]["summary"] == "slow topic"
+    assert job.result["admission_priority"] == smart_search.PRIORITY_BATCH
+    assert "searching slow topic" in ctx.events and ctx.events[-1] == 100
+    assert job_service.JOB_PRIORITIES[job.priority] == 0
+
+
+def test_jobs_of_one_session_run_one_at_a_time():
+    active, overlaps, order = set(), [], []
+
+    def job(key, name):
+        async def run(reporter):
+            overlaps.append(key in active)
+            active.add(key)
+            order.append(name)
+            await asyncio.sleep(0.02)
+            active.discard(key)
+            return {}
+        return run
+
+    async def main():
+        jobs = JobQueue(workers=4, max_queued=20, ttl_s=60)
+        submitted = [jobs.submit("t", job("s1", f"s1-{i}"), key="s1") for i in range(3)]
+        submitted.append(jobs.submit("t", job("s2", "s2-0"), key="s2"))
+        for j in submitted:
+            await jobs.watch(j.id, wait_s=5)
+        await jobs.shutdown()
+        return submitted
+
+    submitted = asyncio.run(main())
+    assert not any(overlaps) and all(j.status == "done" for j in submitted)
+    assert [n for n in order if n.startswith("s1")] == ["s1-0", "s1-1", "s1-2"]
+    assert order.index("s2-0") < order.index("s1-1")  # other sessions are not held up
+
+
+def test_jobs_left_on_a_previous_loop_are_failed():
+    jobs = JobQueue(workers=1, max_queued=1, ttl_s=60)
+
+    async def forever(reporter):
+        await asyncio.sleep(60)
+
+    async def first():
+        running = jobs.submit("t", forever)
+        await asyncio.sleep(0.01)
+        return running, jobs.submit("t", forever)
+
+    stranded = asyncio.run(first())
+
+    async def second():
+        fresh = jobs.submit("t", forever)  # the old queue no longer counts towards max_queued
+        assert fresh.status == "queued" and jobs.queued == 1
+        await jobs.shutdown()
+
+    asyncio.run(second())
+    running, queued = stranded
+    assert running.status == "cancelled"  # asyncio.run cancelled its worker
+    assert queued.status == "failed" and "restarted" in queued.error
+
+
+def test_watch_forwards_lines_logged_while_it_awaits():
+    class SlowCtx:
+        def __init__(self):
+            self.lines = []
+
+        async def info(self, message):
+            self.lines.append(message)
+
+        async def report_progress(self, progress, total=100):
+            await asyncio.sleep(0.005)
+
+    async def chatty(reporter):
+        for i in range(20):
+            await reporter.info(f"l{i}")
+            await asyncio.sleep(0.001)
+        return {}
+
+    async def main():
+        jobs = JobQueue(workers=1, max_queued=10, ttl_s=60)
+        job = jobs.submit("t", chatty)
+        ctx = SlowCtx()
+        await jobs.watch(job.id, ctx, wait_s=5)
+        await jobs.shutdown()
+        return ctx
+
+    assert asyncio.run(main()).lines == [f"l{i}" for i in range(20)]
@@ -0,0 +1,66 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import services.smart_search_service as smart_search_service
+from services.smart_search_service import step_rewrite
+from utils.local_rewrite import REWRITE_LOCAL_MIN_CONFIDENCE, local_rewrite
+from utils.prompt import build_filter_clauses
+
+
+def test_keyword_queries_get_filters_without_the_llm():
+    out = local_rewrite("Please find European Union AI transparency regulations",
+                        extra_sites=["europa.eu"], time_range="2025..2026")
+    assert out.query == "European Union AI transparency regulations site:europa.eu 2025..2026"
+    assert out.confidence >= REWRITE_LOCAL_MIN_CONFIDENCE
+
+
+def test_vietnamese_filler_is_stripped():
+    out = local_rewrite("Trí tuệ nhân tạo trong nông nghiệp là gì?", target_language="vi")
+    assert out.query == "Trí tuệ nhân tạo trong nông nghiệp"
+    assert out.confidence >= REWRITE_LOCAL_MIN_CONFIDENCE
+
+
+def test_compound_words_are_kept_whole():
+    for query in ("Chiến tranh thế giới thứ hai", "ô nhiễm không khí Hà Nội", "tin tức thế giới hôm nay",
+                  "May 2025 election results"):
+        assert local_rewrite(query).query == query
+    assert local_rewrite("IT jobs 3 May").query == "IT jobs 3 May"
+
+
+def test_stop_words_between_keywords_escalate():
+    out = local_rewrite("IT jobs in Vietnam")
+    assert out.query == "IT jobs Vietnam"
+    assert out.confidence < REWRITE_LOCAL_MIN_CONFIDENCE
+    assert local_rewrite("what is the capital of France").confidence < REWRITE_LOCAL_MIN_CONFIDENCE
+
+
+def test_user_operators_are_kept_and_not_duplicated():
+    out = local_rewrite('asyncio "task group" filetype:pdf', filetype_pdf=True)
+    assert out.query == 'asyncio "task group" filetype:pdf'
+
+
+def test_short_or_translated_queries_escalate():
+    assert local_rewrite("transformers").confidence < REWRITE_LOCAL_MIN_CONFIDENCE
+    assert local_rewrite("giá vàng hôm nay", target_language="en").confidence == 0.0
+
+
+def test_filter_clauses_match_the_prompt_hint():
+    assert build_filter_clauses(prefer_academic=False, time_range="2024..2025", extra_sites=["who.int"], filetype_pdf=True) == \
+        ["site:who.int", "2024..2025", "filetype:pdf"]
+
+
+def test_step_rewrite_reports_the_path(monkeypatch):
+    calls = Counter()
+
+    def llm(payload):
+        calls["llm"] += 1
+        return "transformer architecture overview"
+
+    monkeypatch.setattr(smart_search_service, "rewrite_query", SimpleNamespace(invoke=llm))
+    prefs = dict(prefer_academic=False, time_range=None, extra_sites=None, filetype_pdf=False, target_language="en")
+
+    assert asyncio.run(step_rewrite("EU AI act transparency", prefs, None))[2] == "local"
+    assert asyncio.run(step_rewrite("transformers", prefs, None)) == \
+        ("transformer architecture overview", "transformer architecture overview", "llm")
+    assert calls["llm"] == 1
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from utils.loop_monitor import LoopMonitor, loop_scope, set_stage
+from utils.metrics import METRICS
+
+
+def test_stall_is_captured_with_stack_and_request_tags():
+    monitor = LoopMonitor(interval_ms=20, threshold_ms=100)
+
+    def blocking_call():
+        time.sleep(0.4)
+
+    async def handler():
+        with loop_scope("smart_search", "s-1"):
+            set_stage("summarize")
+            await asyncio.sleep(0.05)
+            blocking_call()
+            await asyncio.sleep(0.05)
+
+    async def main():
+        monitor.start()
+        try:
+            await asyncio.create_task(handler())
+        finally:
+            monitor.stop()
+
+    asyncio.run(main())
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall["tags"] == {"tool": "smart_search", "session": "s-1", "stage": "summarize"}
+    assert any("blocking_call" in line for line in stall["stack"])
+    assert stall["blocked_ms"] >= 300
+    assert METRICS.snapshot()["histograms"]["event_loop_lag_ms"]
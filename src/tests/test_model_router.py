@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils.model_router as router
+
+
+class _FakeModel:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+
+    def generate_content(self, prompt, generation_config=None):
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return SimpleNamespace(text=f" {self.name} ")
+
+
+@pytest.fixture
+def models(monkeypatch):
+    fakes = {name: _FakeModel(name) for name in router.TIER_MODELS.values()}
+    monkeypatch.setattr(router, "_get_model", lambda name: fakes[name])
+    monkeypatch.setattr(router, "_HEALTH", {router.TIER_FAST: router.TierHealth(), router.TIER_STRONG: router.TierHealth()})
+    return fakes
+
+
+def test_stages_route_to_configured_tiers_and_are_recorded(models):
+    with router.track_models() as used:
+        assert router.generate(router.STAGE_CHUNK, "p", None) == router.TIER_MODELS[router.TIER_FAST]
+        router.generate(router.STAGE_MERGE, "p", None)
+    assert used == {
+        router.STAGE_CHUNK: router.TIER_MODELS[router.TIER_FAST],
+        router.STAGE_MERGE: router.TIER_MODELS[router.TIER_STRONG],
+    }
+
+
+def test_failing_strong_tier_falls_back_then_gets_bypassed(models):
+    strong = models[router.TIER_MODELS[router.TIER_STRONG]]
+    strong.fail = True
+    for _ in range(router.HEALTH_MIN_SAMPLES):
+        assert router.generate(router.STAGE_MERGE, "p", None) == router.TIER_MODELS[router.TIER_FAST]
+    assert router.route(router.STAGE_MERGE) == router.TIER_FAST
+
+
+def test_tier_settings_are_validated(monkeypatch):
+    monkeypatch.setenv("GEMINI_TIER_MERGE", " Strong ")
+    assert router._stage_tier("GEMINI_TIER_MERGE", router.TIER_FAST) == router.TIER_STRONG
+    monkeypatch.setenv("GEMINI_TIER_MERGE", "stong")
+    with pytest.raises(EnvironmentError, match="GEMINI_TIER_MERGE='stong'.*fast"):
+        router._stage_tier("GEMINI_TIER_MERGE", router.TIER_STRONG)
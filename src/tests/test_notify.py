@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.notify import Notifier
+
+
+class _FakeCtx:
+    def __init__(self):
+        self.sent = []
+
+    async def _log(self, level, message):
+        self.sent.append((level, message))
+
+    async def debug(self, m): await self._log("debug", m)
+    async def info(self, m): await self._log("info", m)
+    async def warning(self, m): await self._log("warning", m)
+    async def error(self, m): await self._log("error", m)
+
+    async def report_progress(self, progress, total):
+        self.sent.append(("progress", progress))
+
+
+def _run(verbosity, **kw):
+    ctx = _FakeCtx()
+
+    async def main():
+        n = Notifier(ctx, verbosity, window_ms=50, **kw)
+        await n.info("start")
+        await n.report_progress(1)
+        for p in range(2, 40):
+            await n.debug(f"preview {p}")
+            await n.report_progress(p)
+        await n.warning("slow site")
+        await n.report_progress(100)
+        await n.flush()
+
+    asyncio.run(main())
+    return ctx.sent
+
+
+def test_normal_batches_lines_coalesces_progress_and_drops_debug():
+    sent = _run("normal")
+    logs = [s for s in sent if s[0] != "progress"]
+    assert logs == [("info", "start"), ("warning", "slow site")]
+    progress = [p for kind, p in sent if kind == "progress"]
+    assert progress[0] == 1 and progress[-1] == 100 and len(progress) < 5
+
+
+def test_quiet_sends_only_progress():
+    assert {kind for kind, _ in _run("quiet")} == {"progress"}
+
+
+def test_byte_budget_suppresses_further_lines():
+    sent = _run("verbose", max_frame_bytes=20, byte_budget=60)
+    logs = [m for kind, m in sent if kind != "progress"]
+    assert "budget" in logs[-1]
+    assert sum(len(m) for m in logs[:-1]) <= 60
+
+
+def test_same_level_lines_share_a_frame_and_flush_cancels_the_timer():
+    ctx = _FakeCtx()
+
+    async def main():
+        n = Notifier(ctx, "normal", window_ms=50)
+        await n.info("a")
+        await n.info("b")
+        await n.error("c")
+        timer = n._timer
+        await n.flush()
+        await asyncio.sleep(0)
+        return timer
+
+    timer = asyncio.run(main())
+    assert timer.cancelled()
+    assert ctx.sent == [("info", "a\nb"), ("error", "c")]
+
+
+def test_flush_waits_for_a_timer_that_is_already_sending():
+    class SlowCtx(_FakeCtx):
+        async def _log(self, level, message):
+            await asyncio.sleep(0.05)
+            self.sent.append((level, message))
+
+    ctx = SlowCtx()
+
+    async def main():
+        n = Notifier(ctx, "normal", window_ms=10)
+        await n.info("a")
+        await n.error("c")
+        await asyncio.sleep(0.03)  # the timer has popped both lines and is sending "a"
+        await n.flush()
+
+    asyncio.run(main())
+    assert ctx.sent == [("info", "a"), ("error", "c")]
+
+
+def test_previews_go_to_the_client_as_debug_but_are_stored_as_info(monkeypatch):
+    import utils.logger as logger
+
+    rows = []
+    monkeypatch.setattr(logger, "LOG_WRITER", SimpleNamespace(add=rows.append))
+    ctx = _FakeCtx()
+    asyncio.run(logger.log_event(ctx, "info", "https://a · chunk 1", client_level="debug"))
+    assert ctx.sent == [("debug", "https://a · chunk 1")]
+    assert [r["level"] for r in rows] == ["info"]
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import services.prefetch_service as prefetch_service
+import services.smart_search_service as smart_search_service
+from services.prefetch_service import PageCache, Prefetcher, predict_pages
+from services.scrape_service import FanoutPlan
+from utils.state import SearchState, SearchTurn
+
+PAGE = "warm page text " * 40
+
+
+def test_predicts_unread_hits_familiar_domains_first():
+    state = SearchState(session_id="s", turns=[SearchTurn(
+        original_query="q", inferred_prefs={}, used_query="q", result_meta={"top_urls": ["https://docs.example.org/a"]},
+    )])
+    raw = {"results": [{"url": u} for u in [
+        "https://read.com/1", "https://news.com/2", "https://docs.example.org/b", "https://blog.com/3",
+    ]]}
+    assert predict_pages(state, raw, ["https://read.com/1"], limit=2) == ["https://docs.example.org/b", "https://news.com/2"]
+
+
+def test_prefetched_pages_are_served_warm_and_foreground_cancels(monkeypatch):
+    cache = PageCache(max_entries=10, ttl_s=60)
+    fetched = []
+
+    def fetch(url, timeout):
+        fetched.append(url)
+        if url.endswith("slow"):
+            time.sleep(0.3)
+        return PAGE
+
+    monkeypatch.setattr(prefetch_service, "fetch_page_text", fetch)
+    monkeypatch.setattr(smart_search_service, "fetch_page_text", fetch)
+    monkeypatch.setattr(smart_search_service, "PAGE_CACHE", cache)
+
+    async def main():
+        prefetcher = Prefetcher(cache, delay_ms=0)
+        await prefetcher.schedule("s", ["https://a.com/x", "https://b.com/y"])
+        assert "https://a.com/x" in cache and "https://b.com/y" in cache
+
+        # a foreground request arrives while a prefetch is still running
+        task = prefetcher.schedule("s", ["https://c.com/slow", "https://d.com/never"])
+        await asyncio.sleep(0.05)
+        prefetcher.cancel_all()
+        await asyncio.sleep(0.4)
+        assert task.cancelled() and "https://d.com/never" not in fetched
+
+        fetched.clear()
+        _, urls, meta = await smart_search_service.step_scrape(
+            ["https://a.com/x", "https://b.com/y"], None, FanoutPlan(k=2, extra=0))
+        return urls, meta
+
+    urls, meta = asyncio.run(main())
+    assert fetched == []
+    assert urls == ["https://a.com/x", "https://b.com/y"] and meta["from_cache"] == 2
+
+
+def test_foreground_call_cancels_prefetch_running_on_another_loop(monkeypatch):
+    from utils.background_loop import BackgroundLoop
+
+    monkeypatch.setattr(prefetch_service, "fetch_page_text", lambda url, timeout: time.sleep(0.2) or PAGE)
+    prefetcher = Prefetcher(PageCache(max_entries=10, ttl_s=60), delay_ms=0)
+    bg = BackgroundLoop("test-prefetch-loop")
+
+    async def schedule():
+        return prefetcher.schedule("s", ["https://a.com/slow", "https://b.com/never"])
+
+    task = bg.run(schedule())
+
+    async def foreground():
+        await asyncio.sleep(0.05)
+        prefetcher.cancel_all()
+        await asyncio.sleep(0.3)
+
+    asyncio.run(foreground())
+    assert task.cancelled() and "https://b.com/never" not in prefetcher.cache
+
+
+def test_cancelled_prefetch_stops_downloading(monkeypatch):
+    import tools.scrape as scrape
+
+    class _SlowBody:
+        encoding = "utf-8"
+        blocks = 0
+        __enter__ = lambda self: self
+        __exit__ = lambda self, *exc: None
+        raise_for_status = lambda self: None
+
+        def iter_content(self, size):
+            while True:
+                time.sleep(0.02)
+                self.blocks += 1
+                yield b"<p>text</p>"
+
+    bodies, threads = [], []
+
+    def get(url, **kw):
+        threads.append(threading.current_thread().name)
+        bodies.append(_SlowBody())
+        return bodies[-1]
+
+    monkeypatch.setattr(scrape.requests, "get", get)
+    monkeypatch.setattr(prefetch_service, "fetch_page_text", scrape.fetch_page_text)
+
+    async def main():
+        prefetcher = Prefetcher(PageCache(max_entries=10, ttl_s=60), delay_ms=0)
+        task = prefetcher.schedule("s", ["https://a.com/trickle", "https://b.com/never"])
+        await asyncio.sleep(0.1)
+        prefetcher.cancel_all()
+        await asyncio.sleep(0.1)
+        stopped_at = bodies[-1].blocks
+        await asyncio.sleep(0.2)
+        return task, stopped_at
+
+    task, stopped_at = asyncio.run(main())
+    assert task.cancelled() and len(bodies) == 1 and bodies[0].blocks == stopped_at
+    assert threads[0].startswith("prefetch")
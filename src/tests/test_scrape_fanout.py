@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from services.scrape_service import FanoutPlan, provider_content, scrape_hedged
+
+PAGE = "usable text " * 50
+
+
+def test_returns_k_fastest_usable_pages_in_rank_order_and_cancels_stragglers():
+    delays = {"slow": 5.0, "a": 0.01, "broken": 0.01, "b": 0.02, "c": 0.03}
+    cancelled = []
+
+    async def fetch(url, timeout):
+        try:
+            await asyncio.sleep(delays[url])
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return "Error fetching URL: 500" if url == "broken" else PAGE
+
+    async def main():
+        t0 = time.perf_counter()
+        pages, meta = await scrape_hedged(list(delays), fetch, FanoutPlan(k=2, extra=3, deadline_ms=3000))
+        return pages, meta, time.perf_counter() - t0
+
+    pages, meta, elapsed = asyncio.run(main())
+    assert [u for u, _ in pages] == ["a", "b"]
+    assert elapsed < 1
+    assert sorted(cancelled) == ["c", "slow"]
+    assert meta["used"] == 2 and meta["failed"] == 1 and meta["cancelled"] == 2
+
+
+def test_deadline_returns_what_has_arrived():
+    async def fetch(url, timeout):
+        await asyncio.sleep(0.01 if url == "fast" else 5)
+        return PAGE
+
+    pages, meta = asyncio.run(scrape_hedged(["hang1", "fast", "hang2"], fetch, FanoutPlan(k=3, extra=0, deadline_ms=500)))
+    assert [u for u, _ in pages] == ["fast"]
+    assert meta["deadline_hit"] and meta["cancelled"] == 2
+
+
+def test_provider_content_is_used_and_only_short_hits_are_fetched():
+    raw = {"results": [
+        {"url": "full", "raw_content": "provider page " * 100},
+        {"url": "snippet", "raw_content": "too short"},
+        {"url": "none"},
+    ]}
+    fetched = []
+
+    async def fetch(url, timeout):
+        fetched.append(url)
+        return PAGE
+
+    urls = ["full", "snippet", "none"]
+    prefetched = provider_content(raw, urls)
+    assert list(prefetched) == ["full"]
+
+    pages, meta = asyncio.run(scrape_hedged(urls, fetch, FanoutPlan(k=2, extra=1), prefetched=prefetched))
+    assert "full" not in fetched
+    assert pages[0] == ("full", prefetched["full"])
+    assert meta["from_provider"] == 1 and meta["fetched"] == 2
+
+    _, meta = asyncio.run(scrape_hedged(urls, fetch, FanoutPlan(k=1, extra=2), prefetched=prefetched))
+    assert meta["fetched"] == 0 and meta["used"] == 1
+
+
+class _SlowBody:
+    """requests.Response stand-in whose body trickles in forever."""
+
+    def __init__(self):
+        self.blocks = 0
+        self.encoding = "utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        while True:
+            time.sleep(0.02)
+            self.blocks += 1
+            yield b"<p>text</p>"
+
+
+def test_abandoned_fetches_stop_reading(monkeypatch):
+    import tools.scrape as scrape
+
+    bodies = []
+    monkeypatch.setattr(scrape.requests, "get", lambda url, **kw: bodies.append(_SlowBody()) or bodies[-1])
+
+    # wall clock: the per-read timeout alone would never fire on a trickling body
+    t0 = time.perf_counter()
+    assert "longer than" in scrape.fetch_page_text("https://slow.example", timeout=0.1)
+    assert time.perf_counter() - t0 < 1
+
+    async def main():
+        task = asyncio.ensure_future(scrape.run_fetch(scrape.fetch_page_text, "https://slow.example", 30))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.sleep(0.1)
+        stopped_at = bodies[-1].blocks
+        await asyncio.sleep(0.2)
+        return stopped_at, bodies[-1].blocks
+
+    stopped_at, later = asyncio.run(main())
+    assert later == stopped_at
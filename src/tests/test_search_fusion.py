@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.search_service as search_service
+from services.search_service import canonical_url, fan_out_search, providers_label, reciprocal_rank_fusion
+
+
+def _provider(name, hits, delay=0.0, error=None):
+    def search(query):
+        time.sleep(delay)
+        if error:
+            raise error
+        return hits
+    return SimpleNamespace(name=name, search=search)
+
+
+def test_canonical_url_folds_trivial_variants():
+    assert canonical_url("http://www.Example.com/a/?utm_source=x&b=2#top") == canonical_url("https://example.com/a?b=2")
+    assert canonical_url("https://example.com/a?b=2") != canonical_url("https://example.com/a?b=3")
+
+
+def test_rrf_merges_duplicates_and_ranks_agreement_first():
+    fused = reciprocal_rank_fusion({
+        "p1": [{"url": "https://x.com/1", "content": "short"}, {"url": "https://y.com"}],
+        "p2": [{"url": "https://z.com"}, {"url": "http://www.x.com/1/", "content": "a much longer snippet"}],
+    })
+    # x.com/1 is ranked by both providers; a first place beats a second place
+    assert [h["url"] for h in fused] == ["https://x.com/1", "https://z.com", "https://y.com"]
+    top = fused[0]
+    assert top["providers"] == ["p1", "p2"]
+    assert top["content"] == "a much longer snippet"
+
+
+def test_fan_out_returns_what_answered_within_budget(monkeypatch):
+    monkeypatch.setitem(search_service.PROVIDERS, "fast", _provider("fast", [{"url": "https://a.com"}]))
+    monkeypatch.setitem(search_service.PROVIDERS, "broken", _provider("broken", [], error=RuntimeError("boom")))
+    monkeypatch.setitem(search_service.PROVIDERS, "slow", _provider("slow", [{"url": "https://b.com"}], delay=1.0))
+
+    raw, latency_ms = asyncio.run(fan_out_search("q", providers=["fast", "broken", "slow"], budget_ms=200))
+
+    assert [h["url"] for h in raw["results"]] == ["https://a.com"]
+    assert raw["providers"]["fast"]["status"] == "ok"
+    assert raw["providers"]["broken"]["status"] == "error"
+    assert raw["providers"]["slow"]["status"] == "timeout"
+    assert latency_ms < 1000
+    assert providers_label(raw) == "fast"
+
+
+def test_fan_out_raises_when_nothing_answers(monkeypatch):
+    monkeypatch.setitem(search_service.PROVIDERS, "broken", _provider("broken", [], error=RuntimeError("boom")))
+    with pytest.raises(RuntimeError):
+        asyncio.run(fan_out_search("q", providers=["broken"], budget_ms=200))
+
+
+def test_fan_out_keeps_the_primary_providers_top_level_fields(monkeypatch):
+    monkeypatch.setattr(search_service, "_tavily_search", lambda q, timeout=None: {"raw": {
+        "answer": "42", "response_time": 0.7, "results": [{"url": "https://a.com"}],
+    }})
+    monkeypatch.setitem(search_service.PROVIDERS, "other", _provider("other", [{"url": "https://b.com"}]))
+
+    raw, _ = asyncio.run(fan_out_search("q", providers=["tavily", "other"]))
+    assert raw["answer"] == "42" and raw["response_time"] == 0.7
+    assert [h["url"] for h in raw["results"]] == ["https://a.com", "https://b.com"]
+
+
+def test_abandoned_providers_are_bounded_and_time_out(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def hang(query):
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return []
+
+    timeouts = []
+    monkeypatch.setattr(search_service, "_tavily_search",
+                        lambda q, timeout=None: timeouts.append(timeout) or {"raw": {"results": [{"url": "https://a.com"}]}})
+    monkeypatch.setattr(search_service, "SEARCH_PROVIDER_WORKERS", 2)
+    monkeypatch.setattr(search_service, "_executors", {})
+    monkeypatch.setitem(search_service.PROVIDERS, "hung", SimpleNamespace(name="hung", search=hang))
+
+    async def main():
+        for _ in range(5):
+            raw, _ = await fan_out_search("q", providers=["tavily", "hung"], budget_ms=100)
+            assert raw["providers"]["hung"]["status"] == "timeout"
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+    # the hung provider holds at most its own two threads; calls queued behind them never ran
+    assert len(calls) == 2 and all(n.startswith("search-hung") for n in calls)
+    assert len(timeouts) == 5 and all(0 < t <= 0.1 for t in timeouts)
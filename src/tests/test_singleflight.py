@@ -0,0 +1,59 @@
+import asyncio
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import services.search_service as search_service
+import services.smart_search_service as smart_search_service
+from tools.smart_search import smart_search_stream_mcp
+from utils.singleflight import SingleFlight
+
+
+def test_last_waiter_leaving_cancels_the_work():
+    flight = SingleFlight("t")
+    started = Counter()
+
+    async def work():
+        started["n"] += 1
+        await asyncio.sleep(5)
+
+    async def main():
+        a = asyncio.ensure_future(flight.do("k", work))
+        b = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        a.cancel()
+        await asyncio.sleep(0.01)
+        assert flight.in_flight() == 1  # b still waits on it
+        b.cancel()
+        await asyncio.sleep(0.01)
+        return flight.in_flight()
+
+    assert asyncio.run(main()) == 0
+    assert started["n"] == 1
+
+
+def test_identical_concurrent_requests_share_each_step(monkeypatch):
+    calls = Counter()
+
+    def slow(kind, result):
+        def fn(*args, **kwargs):
+            calls[kind] += 1
+            time.sleep(0.2)
+            return result
+        return fn
+
+    hits = [{"url": "https://a"}, {"url": "https://b"}]
+    monkeypatch.setattr(smart_search_service, "rewrite_query", SimpleNamespace(invoke=slow("rewrite", "breaking news")))
+    monkeypatch.setitem(search_service.PROVIDERS, "tavily", SimpleNamespace(name="tavily", search=slow("search", hits)))
+    monkeypatch.setattr(smart_search_service, "fetch_page_text", lambda url, timeout: slow(f"fetch {url}", "page text " * 50)())
+    monkeypatch.setattr(smart_search_service, "summarize_text", SimpleNamespace(invoke=slow("summarize", "summary")))
+
+    async def main():
+        return await asyncio.gather(*[
+            smart_search_stream_mcp(session_id=f"sf-{i}", query="breaking", scrape_k=2, scrape_extra=0)
+            for i in range(5)
+        ])
+
+    out = asyncio.run(main())
+    assert all(r["summary"] == "summary" for r in out)
+    assert calls == Counter({"rewrite": 1, "search": 1, "fetch https://a": 1, "fetch https://b": 1, "summarize": 1})
@@ -0,0 +1,68 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import services.batch_service as batch_service
+import services.search_service as search_service
+from tools.smart_search import smart_search_batch_mcp
+
+
+def _fake(fn):
+    return SimpleNamespace(invoke=fn)
+
+
+def test_batch_shares_rewrites_searches_and_pages(monkeypatch):
+    calls = Counter()
+
+    def rewrite(payload):
+        calls["rewrite"] += 1
+        return payload["query"].split(" #")[0]
+
+    def search(q):
+        calls["search"] += 1
+        return [{"url": "https://a"}, {"url": "https://b"}, {"url": f"https://{q}"}]
+
+    def scrape(url, timeout):
+        calls["scrape"] += 1
+        return f"page {url} " * 50
+
+    def summarize(payload):
+        calls["summarize"] += 1
+        return "summary"
+
+    monkeypatch.setattr(batch_service, "rewrite_query", _fake(rewrite))
+    monkeypatch.setitem(search_service.PROVIDERS, "tavily", SimpleNamespace(name="tavily", search=search))
+    monkeypatch.setattr(batch_service, "fetch_page_text", scrape)
+    monkeypatch.setattr(batch_service, "summarize_text", _fake(summarize))
+
+    queries = ["alpha", "alpha", "beta", "gamma"]
+    out = asyncio.run(smart_search_batch_mcp(queries=queries, max_concurrency=2))
+
+    assert [r["query"] for r in out["results"]] == queries
+    assert calls["rewrite"] == 3
+    assert calls["search"] == 3
+    # https://a and https://b are shared by every query
+    assert calls["scrape"] == 2 + 3
+    assert out["batch_meta"]["provider_calls"]["scrape"] == 5
+    assert out["batch_meta"]["reused"]["rewrite"] == 1
+
+
+def test_every_query_sharing_a_summary_records_its_model(monkeypatch):
+    from utils.model_router import record_models
+    from utils.state import STATE_STORE
+
+    def summarize(payload):
+        record_models({"chunk": "fast-model", "merge": "strong-model"})
+        return "summary"
+
+    monkeypatch.setattr(batch_service, "rewrite_query", _fake(lambda payload: payload["query"]))
+    monkeypatch.setitem(search_service.PROVIDERS, "tavily", SimpleNamespace(name="tavily", search=lambda q: [{"url": "https://a"}]))
+    monkeypatch.setattr(batch_service, "fetch_page_text", lambda url, timeout: "same page " * 50)
+    monkeypatch.setattr(batch_service, "summarize_text", _fake(summarize))
+
+    sids = ["models-1", "models-2", "models-3"]
+    out = asyncio.run(smart_search_batch_mcp(queries=["delta"] * 3, session_ids=sids, max_concurrency=3))
+
+    assert out["batch_meta"]["provider_calls"]["summarize"] == 1
+    for sid in sids:
+        assert STATE_STORE.get(sid).turns[-1].result_meta["models"] == {"chunk": "fast-model", "merge": "strong-model"}
@@ -0,0 +1,160 @@
+import http.server
+import socket
+import threading
+import tracemalloc
+
+import pytest
+
+import tools.summarize as summarize
+import utils.doc_source as doc_source
+
+
+def _stub_llm(monkeypatch, seen):
+    def chunk(ch, *args):
+        seen["chunks"] += 1
+        seen["max_len"] = max(seen.get("max_len", 0), len(ch))
+        return f"part {seen['chunks']}"
+
+    def merge(parts, *args):
+        seen["merges"] += 1
+        assert len(parts) <= summarize.MERGE_FANIN
+        return "merged"
+
+    monkeypatch.setattr(summarize, "_summarize_chunk", chunk)
+    monkeypatch.setattr(summarize, "_merge_summaries", merge)
+
+
+def test_large_file_is_summarized_with_flat_memory(tmp_path, monkeypatch):
+    doc = tmp_path / "report.txt"
+    line = "Quarterly figures rose across every region, with exports leading the gains. " * 4 + "\n"
+    with open(doc, "w", encoding="utf-8") as f:
+        while f.tell() < 16 * 1024 * 1024:
+            f.write(line)
+    monkeypatch.setattr(doc_source, "SUMMARIZE_ALLOWED_DIRS", [str(tmp_path)])
+    monkeypatch.setattr(doc_source, "SUMMARIZE_MAX_SOURCE_BYTES", 32 * 1024 * 1024)
+    seen = {"chunks": 0, "merges": 0}
+    _stub_llm(monkeypatch, seen)
+
+    tracemalloc.start()
+    try:
+        out = summarize.summarize_text.invoke({"source": f"file://{doc}"})
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert out == "merged"
+    assert seen["chunks"] > 2500 and seen["max_len"] == summarize.CHUNK_SIZE
+    assert peak < 8 * 1024 * 1024
+
+
+def test_paths_outside_allowed_dirs_are_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_source, "SUMMARIZE_ALLOWED_DIRS", [str(tmp_path / "docs")])
+    with pytest.raises(PermissionError):
+        list(doc_source.iter_source_text(str(tmp_path / "docs" / ".." / "secret.txt")))
+
+
+def test_text_and_source_are_exclusive():
+    with pytest.raises(ValueError):
+        summarize.SummarizeInput(text="a", source="/tmp/a.txt")
+    with pytest.raises(ValueError):
+        summarize.SummarizeInput()
+
+
+def test_file_over_the_size_cap_is_refused(tmp_path, monkeypatch):
+    doc = tmp_path / "big.txt"
+    doc.write_text("x" * 2000)
+    monkeypatch.setattr(doc_source, "SUMMARIZE_ALLOWED_DIRS", [str(tmp_path)])
+    monkeypatch.setattr(doc_source, "SUMMARIZE_MAX_SOURCE_BYTES", 1000)
+    with pytest.raises(ValueError):
+        list(doc_source.iter_source_text(str(doc)))
+
+
+class _Response:
+    def __init__(self, content_type, body=b"", status=200, headers=None):
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+        self.is_redirect = status in (301, 302, 303, 307, 308)
+        self.encoding = "utf-8"
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+def test_urls_need_an_allowed_public_host_and_text(monkeypatch):
+    public = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 443))]
+    internal = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("169.254.169.254", 80))]
+    monkeypatch.setattr(doc_source, "SUMMARIZE_ALLOWED_HOSTS", ["example.com"])
+    monkeypatch.setattr(doc_source.socket, "getaddrinfo",
+                        lambda host, port: internal if host == "meta.example.com" else public)
+    responses = {
+        "https://docs.example.com/a.txt": _Response("text/plain", "héllo".encode()),
+        "https://docs.example.com/a.pdf": _Response("application/pdf", b"%PDF"),
+        "https://docs.example.com/hop": _Response("text/html", status=302,
+                                                  headers={"Location": "http://meta.example.com/latest"}),
+    }
+    responses["https://docs.example.com/odd.txt"] = odd = _Response("text/plain; charset=x-made-up", "héllo".encode())
+    odd.encoding = "x-made-up"
+    monkeypatch.setattr(doc_source.requests.Session, "get", lambda self, url, **kw: responses[url])
+
+    assert "".join(doc_source.iter_source_text("https://docs.example.com/a.txt")) == "héllo"
+    assert "".join(doc_source.iter_source_text("https://docs.example.com/odd.txt")) == "héllo"  # unknown charset: UTF-8
+    with pytest.raises(PermissionError):
+        list(doc_source.iter_source_text("https://other.org/a.txt"))
+    with pytest.raises(PermissionError):
+        list(doc_source.iter_source_text("https://docs.example.com/hop"))  # redirect to a link-local address
+    with pytest.raises(ValueError):
+        list(doc_source.iter_source_text("https://docs.example.com/a.pdf"))
+
+
+def test_urls_are_fetched_from_the_checked_address(monkeypatch):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.headers["Host"])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"pinned")
+
+        def log_message(self, *args):
+            pass
+
+    seen = []
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    # the name would now resolve elsewhere; the connection must still go where the check said
+    monkeypatch.setattr(doc_source, "_check_url", lambda url: "127.0.0.1")
+    resolve = socket.getaddrinfo
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, *a, **kw: (
+        pytest.fail("host resolved twice") if host == "docs.example.com" else resolve(host, *a, **kw)))
+    try:
+        text = "".join(doc_source.iter_source_text(f"http://docs.example.com:{port}/a.txt"))
+    finally:
+        server.shutdown()
+    assert text == "pinned" and seen == [f"docs.example.com:{port}"]
+
+    adapter = doc_source._PinnedAdapter("docs.example.com", "93.184.216.34")
+    request = doc_source.requests.Request("GET", "https://docs.example.com/a").prepare()
+    host_params, pool_kwargs = adapter.build_connection_pool_key_attributes(request, True)
+    assert host_params["host"] == "93.184.216.34"
+    assert pool_kwargs["server_hostname"] == pool_kwargs["assert_hostname"] == "docs.example.com"
+
+
+def test_failed_folds_stay_bounded(monkeypatch):
+    monkeypatch.setattr(summarize, "_summarize_chunk", lambda ch, *args: "s" * 1000)
+    monkeypatch.setattr(summarize, "_merge_summaries", lambda parts, *args: "")
+    out = summarize._summarize_chunks(iter(["chunk"] * 200), summarize.SummarizeInput(text="x"))
+    assert len(out) <= summarize.CHUNK_SIZE + (summarize.MERGE_FANIN - 1) * 1002
@@ -1,13 +1,28 @@
-from configs.db import get_supabase
-from typing import Any, Dict
-from configs.db_async import get_supabase_async
-
-def save_turn(session_id, turn_dict):
-    sb = get_supabase()
-    res = sb.table("search_turns").insert({**turn_dict, "session_id": session_id}).execute()
-    return res.data
-
-async def save_turn_supabase(session_id: str, turn: Dict[str, Any]):
-    sb = await get_supabase_async()
-    payload = {**turn, "session_id": session_id}
-    await sb.table("search_turns").insert(payload).execute()
\ No newline at end of file
+from datetime import timezone
+from typing import Any, Dict, List
+
+from db.sqlalchemy_async import bulk_insert
+from db.writer import TURN_WRITER
+from utils.state import SearchTurn
+
+def turn_row(session_id: str, turn: SearchTurn) -> Dict[str, Any]:
+    ts = turn.t if turn.t.tzinfo else turn.t.replace(tzinfo=timezone.utc)
+    return {
+        "ts": ts,
+        "session_id": session_id,
+        "original_query": turn.original_query,
+        "rewritten_query": turn.rewritten_query,
+        "used_query": turn.used_query,
+        "provider": turn.provider,
+        "inferred_prefs": turn.inferred_prefs,
+        "result_meta": turn.result_meta,
+    }
+
+def save_turn(session_id: str, turn: SearchTurn) -> None:
+    """Queue one turn for the next bulk write; never blocks the request."""
+    TURN_WRITER.add(turn_row(session_id, turn))
+
+async def save_turns(session_id: str, turns: List[SearchTurn]) -> int:
+    """Write many turns now in a single multi-row INSERT."""
+    import models
+    return await bulk_insert(models.SearchTurn, [turn_row(session_id, t) for t in turns])
@@ -1,9 +1,9 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from langchain_core.tools import tool
-from utils.env import get_env_variable
 import google.generativeai as genai
 from utils.prompt import build_rewrite_prompt
+from utils.model_router import STAGE_REWRITE, generate
 
 class RewriteQueryInput(BaseModel):
     query: str = Field(..., description="Original natural language query")
@@ -16,16 +16,21 @@ class RewriteQueryInput(BaseModel):
 @tool(args_schema=RewriteQueryInput)
 def rewrite_query(**kwargs) -> str:
     """Rewrite the query to be more suitable for web search via Gemini 2.5"""
-    genai.configure(api_key=get_env_variable("GEMINI_API_KEY"))
-    model = genai.GenerativeModel("gemini-2.5-pro")
-
-    prompt = build_rewrite_prompt(**kwargs)
+    args = RewriteQueryInput(**kwargs)
+    prompt = build_rewrite_prompt(
+        args.query,
+        prefer_academic=args.prefer_academic,
+        time_range=args.time_range,
+        extra_sites=args.extra_sites,
+        filetype_pdf=args.filetype_pdf,
+        target_language=args.target_language,
+    )
 
-    resp = model.generate_content(
+    return generate(
+        STAGE_REWRITE,
         prompt,
-        generation_config=genai.types.GenerationConfig(
+        genai.types.GenerationConfig(
             temperature=0,
             max_output_tokens=64,
         )
-    )
-    return (resp.text or "").strip()
\ No newline at end of file
+    )
\ No newline at end of file
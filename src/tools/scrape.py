@@ -1,30 +1,68 @@
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+import asyncio
+import threading
+import time
+
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 import requests
-from bs4 import BeautifulSoup
+from utils.cpu_pool import CPU_POOL
+from utils.executors import FETCH_EXECUTOR, run_in
+from utils.html_text import extract_html_text
+
+FETCH_ERROR_PREFIX = "Error fetching URL:"
+FETCH_BLOCK_BYTES = 64 << 10
+
+# set by run_fetch; fetch_page_text stops reading once it is set
+_cancelled: ContextVar[Optional[threading.Event]] = ContextVar("fetch_cancelled", default=None)
 
 class ScrapeInput(BaseModel):
     url: str = Field(..., description="The URL of the webpage to scrape")
 
-@tool(args_schema=ScrapeInput)
-def get_webpage_content(url: str) -> str:
-    """Download and extract readable text content from a webpage."""
+def fetch_page_text(url: str, timeout: float = 15) -> str:
+    """
+    Download a page and extract its text. `timeout` bounds the whole download, not just each
+    socket read: the body is streamed and abandoned once the time is up or run_fetch's caller
+    has gone away (checked between blocks, so one slow read can still take up to `timeout`).
+    """
+    cancelled = _cancelled.get()
+    until = time.monotonic() + timeout
     try:
-        resp = requests.get(url, timeout=15, headers={
+        with requests.get(url, timeout=timeout, stream=True, headers={
             "User-Agent": "Mozilla/5.0 (compatible; MCPBot/1.0)"
-        })
-        resp.raise_for_status()
+        }) as resp:
+            resp.raise_for_status()
+            body = bytearray()
+            for block in resp.iter_content(FETCH_BLOCK_BYTES):
+                if cancelled is not None and cancelled.is_set():
+                    return f"{FETCH_ERROR_PREFIX} cancelled"
+                if time.monotonic() > until:
+                    return f"{FETCH_ERROR_PREFIX} download took longer than {timeout}s"
+                body += block
+            encoding = resp.encoding
     except Exception as e:
-        return f"Error fetching URL: {e}"
+        return f"{FETCH_ERROR_PREFIX} {e}"
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    # HTML parsing is pure-Python CPU work; hand the raw bytes to the CPU pool
+    return CPU_POOL.run(extract_html_text, bytes(body), encoding)
 
-    for tag in soup(["script", "style", "noscript"]):
-        tag.extract()
-
-    text = soup.get_text(separator="\n", strip=True)
-
-    if len(text) > 10000:
-        text = text[:10000] + "\n...[TRUNCATED]..."
+async def run_fetch(fn: Callable[..., str], *args: Any, executor=FETCH_EXECUTOR) -> str:
+    """
+    Run a blocking page fetch on its own bounded executor. Cancelling the await also tells
+    fetch_page_text to stop reading, so abandoned hedges release their thread and socket.
+    """
+    flag = threading.Event()
+    token = _cancelled.set(flag)
+    try:
+        return await run_in(executor, fn, *args)
+    except asyncio.CancelledError:
+        flag.set()
+        raise
+    finally:
+        _cancelled.reset(token)
 
-    return text
+@tool(args_schema=ScrapeInput)
+def get_webpage_content(url: str) -> str:
+    """Download and extract readable text content from a webpage."""
+    return fetch_page_text(url)
@@ -1,19 +1,30 @@
 from pydantic import BaseModel, Field
-from typing import Iterable, Optional, List, Dict, Any
+from typing import Iterable, Optional, List, Dict, Any, Tuple
 from langchain_core.tools import tool
 from datetime import datetime
-import requests, re, json
+import asyncio, re, json, time, uuid
 
+from db.writer import LOG_WRITER, TURN_WRITER
+from services.batch_service import DEFAULT_BATCH_CONCURRENCY, BatchWorkspace
+from services.job_service import JOBS
+from services.prefetch_service import PREFETCH_ENABLED, PREFETCHER, predict_pages
+from services.search_service import providers_label, without_raw_content
+from services.scrape_service import SCRAPE_DEADLINE_MS, SCRAPE_EXTRA, SCRAPE_K, FanoutPlan, provider_content, scrape_hedged
 from services.smart_search_service import step_combine, step_extract_urls, step_load_state, step_rewrite, step_scrape, step_search, step_summarize
-from tools.scrape import get_webpage_content
-from tools.summarize import summarize_text
-from utils.env import get_env_variable
+from tools.persistence import save_turn
 from utils.logger import log_event, report_progress
-from utils.sse import chunk_text
+from utils.deadline import Deadline, deadline_scope
+from utils.env import get_env_variable
+from utils.background_loop import SYNC_LOOP
+from utils.admission import PRIORITY_BATCH, PRIORITY_INTERACTIVE, admission_scope
+from utils.loop_monitor import loop_scope, set_stage
+from utils.model_router import track_models
+from utils.notify import VERBOSITY_NORMAL, Notifier
 from utils.state import STATE_STORE, SearchState, SearchTurn
-from tools.rewrite import rewrite_query
 from fastmcp import Context
 
+SMART_SEARCH_DEADLINE_MS = int(get_env_variable("SMART_SEARCH_DEADLINE_MS", "45000"))
+
 class SmartSearchInput(BaseModel):
     session_id: str = Field(
         ...,
@@ -43,6 +54,26 @@ class SmartSearchInput(BaseModel):
         None,
         description="Language code for translating or summarizing results, e.g., 'en', 'vi'"
     )
+    scrape_k: Optional[int] = Field(
+        None,
+        description=f"Pages to scrape and summarize (default {SCRAPE_K})"
+    )
+    scrape_extra: Optional[int] = Field(
+        None,
+        description=f"Extra candidate pages fetched in parallel as hedges against slow sites (default {SCRAPE_EXTRA})"
+    )
+    scrape_deadline_ms: Optional[int] = Field(
+        None,
+        description=f"Deadline for the whole scrape fan-out; slower pages are dropped (default {SCRAPE_DEADLINE_MS})"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        None,
+        description=f"Overall time budget; stages degrade (skip rewrite, fewer pages/chunks, no summary) to meet it (default {SMART_SEARCH_DEADLINE_MS}, 0 = none)"
+    )
+
+    def fanout_plan(self) -> FanoutPlan:
+        return FanoutPlan.from_args(k=self.scrape_k, extra=self.scrape_extra, deadline_ms=self.scrape_deadline_ms)
 
 def _infer_prefs(q: SmartSearchInput) -> Dict[str, Any]:
     text = q.query.lower()
@@ -88,20 +119,6 @@ def _infer_prefs(q: SmartSearchInput) -> Dict[str, Any]:
         target_language=target_language
     )
 
-def _tavily_search(raw_query: str) -> Dict[str, Any]:
-    import time
-    t0 = time.perf_counter()
-    resp = requests.post(
-        "https://api.tavily.com/search",
-        json={"query": raw_query},
-        headers={"Authorization": f"Bearer {get_env_variable('TAVILY_API_KEY')}"},
-        timeout=20
-    )
-    latency_ms = int((time.perf_counter() - t0)*1000)
-    resp.raise_for_status()
-    data = resp.json()
-    return {"raw": data, "latency_ms": latency_ms}
-
 @tool(args_schema=SmartSearchInput)
 def smart_search(**kwargs) -> str:
     """
@@ -109,150 +126,240 @@ def smart_search(**kwargs) -> str:
     1) Load state by session_id
     2) Infer rewrite params (optionally combine with historical preferences)
     3) Rewrite via Gemini 2.5
-    4) Tavily search
-    5) Persist turn into state
-    Return: JSON string { rewritten_query, used_query, result, state_meta }
+    4) Tavily search, then scrape the top pages with hedged fan-out
+    5) Summarize and persist turn into state
+    Return: JSON string { rewritten_query, used_query, result, summary, state_meta }
+    Runs the same pipeline as smart_search_stream on the shared background loop.
     """
     args = SmartSearchInput(**kwargs)
-    state = STATE_STORE.get(args.session_id) or SearchState(session_id=args.session_id)
 
-    prefs = _infer_prefs(args)
+    async def run() -> Dict[str, Any]:
+        try:
+            return await _smart_search_pipeline(args, None)
+        finally:
+            # sync callers may exit right after returning; don't leave the turn in the buffer
+            await LOG_WRITER.flush()
+            await TURN_WRITER.flush()
 
-    try:
-        rewritten = rewrite_query.invoke({
-            "query": args.query,
-            **prefs
-        }).strip()
-        use_query = rewritten if rewritten else args.query
-    except Exception:
-        rewritten = None
-        use_query = args.query
+    out = SYNC_LOOP.run(run())
+    return json.dumps(out, ensure_ascii=False)
 
-    sr = _tavily_search(use_query)
-    raw = sr["raw"]
-    latency_ms = sr["latency_ms"]
 
-    top_urls = []
-    if isinstance(raw, dict):
-        hits = raw.get("results") or raw.get("data") or []
-        for h in hits[:3]: 
-            url = h.get("url") or h.get("link")
-            if url:
-                top_urls.append(url)
+async def smart_search_stream_mcp(
+    session_id: str,
+    query: str,
+    prefer_academic: Optional[bool] = None,
+    time_range: Optional[str] = None,
+    extra_sites: Optional[List[str]] = None,
+    filetype_pdf: Optional[bool] = None,
+    target_language: Optional[str] = None,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    deadline_ms: Optional[int] = None,
+    verbosity: Optional[str] = VERBOSITY_NORMAL,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    args = SmartSearchInput(
+        session_id=session_id, query=query,
+        prefer_academic=prefer_academic, time_range=time_range,
+        extra_sites=extra_sites, filetype_pdf=filetype_pdf, target_language=target_language,
+        scrape_k=scrape_k, scrape_extra=scrape_extra, scrape_deadline_ms=scrape_deadline_ms,
+        deadline_ms=deadline_ms,
+    )
+    if ctx is not None:
+        ctx = Notifier(ctx, verbosity)
+    try:
+        return await _smart_search_pipeline(args, ctx)
+    finally:
+        if ctx is not None:
+            await ctx.flush()
 
-    scraped_contents = []
-    for url in top_urls:
-        try:
-            content = get_webpage_content.invoke({"url": url})
-            if content:
-                scraped_contents.append(content)
-        except Exception:
-            continue
 
-    historical_context = "\n\n".join(
-        t.original_query + " → " + (t.rewritten_query or t.original_query)
-        for t in state.turns[-3:] 
+async def submit_search_mcp(
+    session_id: str,
+    query: str,
+    prefer_academic: Optional[bool] = None,
+    time_range: Optional[str] = None,
+    extra_sites: Optional[List[str]] = None,
+    filetype_pdf: Optional[bool] = None,
+    target_language: Optional[str] = None,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
+    deadline_ms: Optional[int] = None,
+    priority: str = "normal",
+) -> Dict[str, Any]:
+    args = SmartSearchInput(
+        session_id=session_id, query=query,
+        prefer_academic=prefer_academic, time_range=time_range,
+        extra_sites=extra_sites, filetype_pdf=filetype_pdf, target_language=target_language,
+        scrape_k=scrape_k, scrape_extra=scrape_extra, scrape_deadline_ms=scrape_deadline_ms,
+        deadline_ms=deadline_ms,
     )
+    # jobs yield Gemini / search capacity to interactive calls
+    job = JOBS.submit(
+        "smart_search",
+        lambda reporter: _smart_search_pipeline(args, reporter, PRIORITY_BATCH),
+        priority=priority,
+        params={"session_id": session_id, "query": query},
+        key=session_id,  # turns of one session must not be written concurrently
+    )
+    return {"job_id": job.id, "status": job.status, "priority": job.priority, "queued": JOBS.queued}
 
-    combined_text = "\n\n".join(scraped_contents)
-    if historical_context:
-        combined_text = f"Previous search context:\n{historical_context}\n\nCurrent content:\n{combined_text}"
 
-    try:
-        summary = summarize_text.invoke({
-            "text": combined_text,
-            "max_words": 250,
-            "language": prefs.get("target_language"),
-            "style": "balanced",
-            "include_bullets": True,
-            "title": args.query
-        })
-    except Exception:
-        summary = None
+async def _smart_search_pipeline(args: SmartSearchInput, ctx: Optional[Notifier],
+                                 admission_priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    session_id, query = args.session_id, args.query
+    deadline = Deadline(SMART_SEARCH_DEADLINE_MS if args.deadline_ms is None else args.deadline_ms)
+    with loop_scope("smart_search", session_id), admission_scope(session_id, admission_priority), \
+            deadline_scope(deadline), track_models() as models_used:
+        await log_event(ctx, "info", f"smart_search start | session={session_id}", session_id=session_id)
+        await report_progress(ctx, 1)
 
-    turn = SearchTurn(
-        original_query=args.query,
-        inferred_prefs=prefs,
-        rewritten_query=rewritten,
-        used_query=use_query,
-        provider="tavily",
-        result_meta={
-            "top_urls": top_urls,
-            "latency_ms": latency_ms,
-            "summary": summary
-        }
-    )
-    state.turns.append(turn)
-    STATE_STORE.set(state)
+        state = await step_load_state(session_id, ctx)
+        prefs = _infer_prefs(args)
+        await log_event(ctx, "info", f"prefs inferred | {prefs}", session_id=session_id)
+        await report_progress(ctx, 7)
 
-    out = {
-        "rewritten_query": rewritten,
-        "used_query": use_query,
-        "result": raw,
-        "summary": summary,
-        "state_meta": {
-            "session_id": state.session_id,
-            "turn_count": len(state.turns),
-            "latest_top_urls": top_urls,
-            "latency_ms": latency_ms
+        plan = args.fanout_plan()
+        rewritten, use_query, rewrite_path = await step_rewrite(query, prefs, ctx, deadline)
+        raw, latency_ms = await step_search(use_query, ctx, deadline)
+        candidates = step_extract_urls(raw, limit=plan.candidates)
+        scraped, urls, scrape_meta = await step_scrape(candidates, ctx, plan, provider_content(raw, candidates), deadline)
+        combined = step_combine(state, scraped)
+        await log_event(ctx, "info", f"combine ready | total_chars={len(combined)} | has_history={combined.startswith('Previous search context:')}")
+        summary = await step_summarize(combined, query, prefs.get("target_language"), ctx, deadline)
+        if deadline.degraded:
+            await log_event(ctx, "warning", f"degraded to meet the deadline: {', '.join(deadline.degraded)}")
+
+        turn = SearchTurn(
+            original_query=query,
+            inferred_prefs=prefs,
+            rewritten_query=rewritten,
+            used_query=use_query,
+            provider=providers_label(raw),
+            result_meta={"top_urls": urls, "latency_ms": latency_ms, "summary": summary, "models": models_used,
+                         "rewrite_path": rewrite_path, "scrape": scrape_meta, "deadline": deadline.meta()}
+        )
+        set_stage("persist")
+        # another call may have added turns meanwhile; append to the stored state, as the batch path does
+        state = STATE_STORE.get(session_id) or state
+        state.turns.append(turn)
+        STATE_STORE.set(state)
+        save_turn(state.session_id, turn)
+        await log_event(ctx, "info", "state persisted")
+        if PREFETCH_ENABLED:
+            PREFETCHER.schedule(session_id, predict_pages(state, raw, urls))
+        await report_progress(ctx, 100)
+
+        return {
+            "rewritten_query": rewritten,
+            "used_query": use_query,
+            "rewrite_path": rewrite_path,
+            "result": without_raw_content(raw),
+            "summary": summary,
+            "state_meta": {
+                "session_id": state.session_id,
+                "turn_count": len(state.turns),
+                "latest_top_urls": urls,
+                "latency_ms": latency_ms,
+                "scrape": scrape_meta,
+                "deadline": deadline.meta()
+            }
         }
-    }
-    return json.dumps(out, ensure_ascii=False)
 
 
-async def smart_search_stream_mcp(
-    session_id: str,
-    query: str,
+async def smart_search_batch_mcp(
+    queries: List[str],
+    session_id: Optional[str] = None,
+    session_ids: Optional[List[str]] = None,
     prefer_academic: Optional[bool] = None,
     time_range: Optional[str] = None,
     extra_sites: Optional[List[str]] = None,
     filetype_pdf: Optional[bool] = None,
     target_language: Optional[str] = None,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    scrape_k: Optional[int] = None,
+    scrape_extra: Optional[int] = None,
+    scrape_deadline_ms: Optional[int] = None,
     ctx: Context = None,
 ) -> Dict[str, Any]:
-    await log_event(ctx, "info", f"smart_search start | session={session_id}", session_id=session_id)
-    await report_progress(ctx, 1)
+    if session_ids is not None and len(session_ids) != len(queries):
+        raise ValueError("session_ids must have the same length as queries")
+    t0 = time.perf_counter()
+    total = len(queries)
+    batch_id = uuid.uuid4().hex[:8]
+    ws = BatchWorkspace(max_concurrency)
+    plan = FanoutPlan.from_args(k=scrape_k, extra=scrape_extra, deadline_ms=scrape_deadline_ms)
+    await log_event(ctx, "info", f"smart_search_batch start | batch={batch_id} | queries={total}", session_id=session_id)
+    await report_progress(ctx, 0, total)
 
-    state = await step_load_state(session_id, ctx)
-    args = dict(
-        session_id=session_id, query=query,
-        prefer_academic=prefer_academic, time_range=time_range,
-        extra_sites=extra_sites, filetype_pdf=filetype_pdf, target_language=target_language
-    )
-    prefs = _infer_prefs(type("Tmp", (), args)) 
-    await log_event(ctx, "info", f"prefs inferred | {prefs}", session_id=session_id)
-    await report_progress(ctx, 7)
+    async def run_one(i: int, query: str) -> Tuple[int, Dict[str, Any]]:
+        sid = (session_ids[i] if session_ids else None) or session_id or f"batch-{batch_id}-{i}"
+        with loop_scope("smart_search_batch", sid), admission_scope(sid, PRIORITY_BATCH), track_models() as models_used:
+            async with ws.slots:
+                state = STATE_STORE.get(sid) or SearchState(session_id=sid)
+                history = SearchState(session_id=sid, turns=list(state.turns))
+                prefs = _infer_prefs(SmartSearchInput(
+                    session_id=sid, query=query,
+                    prefer_academic=prefer_academic, time_range=time_range,
+                    extra_sites=extra_sites, filetype_pdf=filetype_pdf, target_language=target_language,
+                ))
+                rewritten, use_query, rewrite_path = await ws.rewrite(query, prefs)
+                try:
+                    raw, latency_ms = await ws.search(use_query)
+                except Exception as e:
+                    return i, {"query": query, "used_query": use_query, "error": f"search failed: {e!r}"}
+                candidates = step_extract_urls(raw, limit=plan.candidates)
+                pages, scrape_meta = await scrape_hedged(candidates, ws.scrape, plan, prefetched=provider_content(raw, candidates))
+                urls = [u for u, _ in pages]
+                combined = step_combine(history, [c for _, c in pages])
+                summary = await ws.summarize(combined, query, prefs.get("target_language"))
 
-    rewritten, use_query = await step_rewrite(query, prefs, ctx)
-    raw, latency_ms = await step_search(use_query, ctx)
-    urls = step_extract_urls(raw)
-    scraped = await step_scrape(urls, ctx)
-    combined = step_combine(state, scraped)
-    await log_event(ctx, "info", f"combine ready | total_chars={len(combined)} | has_history={combined.startswith('Previous search context:')}")
-    summary = await step_summarize(combined, query, prefs.get("target_language"), ctx)
+        turn = SearchTurn(
+            original_query=query,
+            inferred_prefs=prefs,
+            rewritten_query=rewritten,
+            used_query=use_query,
+            provider=providers_label(raw),
+            result_meta={"top_urls": urls, "latency_ms": latency_ms, "summary": summary, "models": models_used,
+                         "rewrite_path": rewrite_path, "scrape": scrape_meta, "batch_id": batch_id}
+        )
+        state = STATE_STORE.get(sid) or state
+        state.turns.append(turn)
+        STATE_STORE.set(state)
+        save_turn(state.session_id, turn)
+        return i, {
+            "query": query,
+            "rewritten_query": rewritten,
+            "used_query": use_query,
+            "rewrite_path": rewrite_path,
+            "result": without_raw_content(raw),
+            "summary": summary,
+            "state_meta": {
+                "session_id": sid,
+                "turn_count": len(state.turns),
+                "latest_top_urls": urls,
+                "latency_ms": latency_ms,
+                "scrape": scrape_meta
+            }
+        }
 
-    turn = SearchTurn(
-        original_query=query,
-        inferred_prefs=prefs,
-        rewritten_query=rewritten,
-        used_query=use_query,
-        provider="tavily",
-        result_meta={"top_urls": urls, "latency_ms": latency_ms, "summary": summary}
-    )
-    state.turns.append(turn)
-    STATE_STORE.set(state)
-    await log_event(ctx, "info", "state persisted")
-    await report_progress(ctx, 100)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    done = 0
+    for fut in asyncio.as_completed([run_one(i, q) for i, q in enumerate(queries)]):
+        i, res = await fut
+        results[i] = res
+        done += 1
+        await log_event(ctx, "info", f"batch result [{i+1}/{total}]\n{json.dumps({'index': i, **res}, ensure_ascii=False)}", session_id=res.get("state_meta", {}).get("session_id"))
+        await report_progress(ctx, done, total)
 
-    return {
-        "rewritten_query": rewritten,
-        "used_query": use_query,
-        "result": raw,
-        "summary": summary,
-        "state_meta": {
-            "session_id": state.session_id,
-            "turn_count": len(state.turns),
-            "latest_top_urls": urls,
-            "latency_ms": latency_ms
-        }
-    }
\ No newline at end of file
+    batch_meta = {
+        "batch_id": batch_id,
+        "queries": total,
+        "latency_ms": int((time.perf_counter() - t0) * 1000),
+        **ws.meta(),
+    }
+    await log_event(ctx, "info", f"smart_search_batch done | {batch_meta}", session_id=session_id)
+    return {"results": results, "batch_meta": batch_meta}
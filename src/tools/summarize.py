@@ -1,23 +1,28 @@
 
 from __future__ import annotations
 
-from typing import Optional, Literal, List
-from pydantic import BaseModel, Field
+from typing import Iterable, Optional, Literal, List
+from pydantic import BaseModel, Field, model_validator
 from langchain_core.tools import tool
 import google.generativeai as genai
-from utils.env import get_env_variable
 from utils.prompt import build_chunk_prompt, build_merge_prompt
+from utils.deadline import current_deadline
+from utils.doc_source import iter_chunks, iter_source_text
+from utils.model_router import STAGE_CHUNK, STAGE_MERGE, generate
 
-GEMINI_MODEL = "gemini-2.5-pro"
 CHUNK_SIZE = 6000
 CHUNK_OVERLAP = 400
-
-def _get_model():
-    genai.configure(api_key=get_env_variable("GEMINI_API_KEY"))
-    return genai.GenerativeModel(GEMINI_MODEL)
+# under a request deadline, stop summarizing chunks once less than this is left for the merge
+MERGE_RESERVE_MS = 4000
+# partial summaries are folded into one once this many pile up, so huge inputs stay bounded
+MERGE_FANIN = 16
 
 class SummarizeInput(BaseModel):
-    text: str = Field(..., description="Raw text to summarize")
+    text: Optional[str] = Field(default=None, description="Raw text to summarize")
+    source: Optional[str] = Field(
+        default=None,
+        description="Instead of text: local path, file:// URI or http(s) URL of a UTF-8 document, read as a stream"
+    )
     max_words: int = Field(200, ge=50, le=1200, description="Maximum words for the final summary")
     language: Optional[Literal["vi", "en"]] = Field(
         default=None, description="Force output language: 'vi' or 'en' (auto if None)"
@@ -32,6 +37,12 @@ class SummarizeInput(BaseModel):
         default=None, description="Optional title/topic to anchor the summary"
     )
 
+    @model_validator(mode="after")
+    def _one_input(self) -> "SummarizeInput":
+        if (self.text is None) == (self.source is None):
+            raise ValueError("give exactly one of text or source")
+        return self
+
 # ============== Chunking ==============
 def _chunk_text(s: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
     s = s.strip()
@@ -47,47 +58,61 @@ def _chunk_text(s: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERL
         start = max(0, end - overlap)
     return chunks
 
-def _summarize_chunk(model, chunk: str, language: Optional[str], style: str, include_bullets: bool) -> str:
+def _summarize_chunk(chunk: str, language: Optional[str], style: str, include_bullets: bool) -> str:
     prompt = build_chunk_prompt(chunk, language, style, include_bullets)
-    resp = model.generate_content(
+    return generate(
+        STAGE_CHUNK,
         prompt,
-        generation_config=genai.types.GenerationConfig(
+        genai.types.GenerationConfig(
             temperature=0.2,
             max_output_tokens=800, 
         ),
     )
-    return (getattr(resp, "text", "") or "").strip()
 
-def _merge_summaries(model, parts: List[str], language: Optional[str], style: str, max_words: int, title: Optional[str], include_bullets: bool) -> str:
+def _merge_summaries(parts: List[str], language: Optional[str], style: str, max_words: int, title: Optional[str], include_bullets: bool) -> str:
     prompt = build_merge_prompt(parts, language, style, max_words, title, include_bullets)
-    resp = model.generate_content(
+    return generate(
+        STAGE_MERGE,
         prompt,
-        generation_config=genai.types.GenerationConfig(
+        genai.types.GenerationConfig(
             temperature=0.2,
             max_output_tokens=600,
         ),
     )
-    return (getattr(resp, "text", "") or "").strip()
 
 @tool(args_schema=SummarizeInput)
 def summarize_text(**kwargs) -> str:
     """
     Summarize long text safely with Gemini 2.5.
     - Auto-chunk long input, summarize per chunk, then merge into a coherent final summary.
+    - Input is either `text` or `source` (path / file:// URI / URL); a source is streamed and
+      chunked lazily, so memory stays flat however large the document is.
     - Parameters: max_words, language ('vi'/'en'), style ('concise'|'balanced'|'detailed'), include_bullets, title.
     """
     args = SummarizeInput(**kwargs)
-    model = _get_model()
+    if args.source is not None:
+        chunks: Iterable[str] = iter_chunks(iter_source_text(args.source), CHUNK_SIZE, CHUNK_OVERLAP)
+    else:
+        chunks = _chunk_text(args.text)
+    return _summarize_chunks(chunks, args)
 
-    chunks = _chunk_text(args.text)
-    part_summaries = []
+def _summarize_chunks(chunks: Iterable[str], args: SummarizeInput) -> str:
+    deadline = current_deadline()
+    part_summaries: List[str] = []
     for ch in chunks:
-        s = _summarize_chunk(model, ch, args.language, args.style, args.include_bullets)
+        if part_summaries and deadline is not None and deadline.remaining_ms() < MERGE_RESERVE_MS:
+            deadline.degrade("fewer_chunks")
+            break
+        s = _summarize_chunk(ch, args.language, args.style, args.include_bullets)
         if s:
             part_summaries.append(s)
+        if len(part_summaries) >= MERGE_FANIN:
+            folded = _merge_summaries(part_summaries, args.language, args.style, args.max_words, args.title, args.include_bullets)
+            # if the merge fails, carry a truncated join so repeated failures cannot grow it
+            part_summaries = [folded or "\n\n".join(part_summaries)[:CHUNK_SIZE]]
 
     if not part_summaries:
         return "No summary could be generated."
 
-    final = _merge_summaries(model, part_summaries, args.language, args.style, args.max_words, args.title, args.include_bullets)
+    final = _merge_summaries(part_summaries, args.language, args.style, args.max_words, args.title, args.include_bullets)
     return final or "\n\n".join(part_summaries)
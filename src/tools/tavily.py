@@ -1,18 +1,43 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel
 import requests
+import time
+from typing import Any, Dict, Optional
 from utils.env import get_env_variable
 
+TAVILY_URL = "https://api.tavily.com/search"
+# provider-side page content lets the scrape stage skip re-downloading those hits
+TAVILY_INCLUDE_RAW_CONTENT = get_env_variable("TAVILY_INCLUDE_RAW_CONTENT", "true").lower() in ("1", "true", "yes")
+TAVILY_MAX_RESULTS = int(get_env_variable("TAVILY_MAX_RESULTS", "5"))
+TAVILY_SEARCH_DEPTH = get_env_variable("TAVILY_SEARCH_DEPTH", "basic")
+
 class TavilySearchInput(BaseModel):
     query: str
 
+def _tavily_post(payload: Dict[str, Any], timeout: Optional[float] = 20) -> requests.Response:
+    return requests.post(
+        TAVILY_URL,
+        json=payload,
+        headers={"Authorization": f"Bearer {get_env_variable('TAVILY_API_KEY')}"},
+        timeout=timeout
+    )
 
 @tool(args_schema=TavilySearchInput)
 def tavily_search(query: str) -> str:
     """Search the web using Tavily API"""
-    response = requests.post(
-        "https://api.tavily.com/search",
-        json={"query": query},
-        headers={"Authorization": f"Bearer {get_env_variable('TAVILY_API_KEY')}"}
-    )
-    return response.text
+    return _tavily_post({"query": query}).text
+
+def _tavily_search(raw_query: str, include_raw_content: bool = TAVILY_INCLUDE_RAW_CONTENT,
+                   max_results: int = TAVILY_MAX_RESULTS, search_depth: str = TAVILY_SEARCH_DEPTH,
+                   timeout: Optional[float] = 20) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    resp = _tavily_post({
+        "query": raw_query,
+        "include_raw_content": include_raw_content,
+        "max_results": max_results,
+        "search_depth": search_depth,
+    }, timeout=timeout)
+    latency_ms = int((time.perf_counter() - t0)*1000)
+    resp.raise_for_status()
+    data = resp.json()
+    return {"raw": data, "latency_ms": latency_ms}
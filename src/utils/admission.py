@@ -0,0 +1,132 @@
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+import threading
+import time
+
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+# Lower value = served first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a call waited longer than the queue deadline for a dependency slot."""
+
+    def __init__(self, dependency: str, waited_ms: int, queue_depth: int) -> None:
+        super().__init__(
+            f"{dependency} is overloaded: waited {waited_ms} ms for a slot "
+            f"({queue_depth} calls still queued); try again later"
+        )
+        self.dependency = dependency
+        self.waited_ms = waited_ms
+        self.queue_depth = queue_depth
+
+# (session_id, priority) of the work currently running; copied into worker threads by asyncio.to_thread
+_admission_ctx: ContextVar[Tuple[Optional[str], int]] = ContextVar("admission_ctx", default=(None, PRIORITY_INTERACTIVE))
+
+@contextmanager
+def admission_scope(session_id: Optional[str], priority: int = PRIORITY_INTERACTIVE) -> Iterator[None]:
+    token = _admission_ctx.set((session_id, priority))
+    try:
+        yield
+    finally:
+        _admission_ctx.reset(token)
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.granted = False
+
+class FairLimiter:
+    """
+    Concurrency budget for one dependency.
+    - Waiting calls are served by priority first, then round-robin across session_ids,
+      so one busy session cannot starve the others.
+    - A call that waits longer than `max_wait_s` is shed with AdmissionRejected.
+    Works from any thread and blocks it while queued; async code should reach it through
+    utils.executors.GEMINI_EXECUTOR, not the default executor.
+    """
+
+    def __init__(self, name: str, limit: int, max_wait_s: float) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_wait_s = max_wait_s
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queues: Dict[int, "OrderedDict[Optional[str], deque[_Waiter]]"] = {}
+        self._depth = 0
+
+    def _publish(self) -> None:
+        labels = {"dependency": self.name}
+        METRICS.set_gauge("admission_queue_depth", self._depth, labels)
+        METRICS.set_gauge("admission_in_flight", self._active, labels)
+
+    def _grant_next(self) -> None:
+        # caller holds self._lock
+        while self._active < self.limit and self._depth:
+            prio = min(p for p, q in self._queues.items() if q)
+            sessions = self._queues[prio]
+            session_id, waiters = next(iter(sessions.items()))
+            waiter = waiters.popleft()
+            sessions.pop(session_id)
+            if waiters:
+                sessions[session_id] = waiters  # move to the back: round-robin
+            self._depth -= 1
+            self._active += 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def acquire(self) -> None:
+        session_id, priority = _admission_ctx.get()
+        labels = {"dependency": self.name}
+        t0 = time.perf_counter()
+        with self._lock:
+            if self._active < self.limit and not self._depth:
+                self._active += 1
+                self._publish()
+                METRICS.observe("admission_wait_ms", 0, labels)
+                return
+            waiter = _Waiter()
+            self._queues.setdefault(priority, OrderedDict()).setdefault(session_id, deque()).append(waiter)
+            self._depth += 1
+            self._publish()
+
+        waiter.event.wait(self.max_wait_s)
+        waited_ms = int((time.perf_counter() - t0) * 1000)
+        with self._lock:
+            if not waiter.granted:
+                waiters = self._queues[priority][session_id]
+                waiters.remove(waiter)
+                if not waiters:
+                    self._queues[priority].pop(session_id)
+                self._depth -= 1
+                self._publish()
+                METRICS.inc("admission_shed_total", labels=labels)
+                raise AdmissionRejected(self.name, waited_ms, self._depth)
+            self._publish()
+        METRICS.observe("admission_wait_ms", waited_ms, labels)
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._grant_next()
+            self._publish()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+GEMINI_LIMITER = FairLimiter(
+    "gemini",
+    limit=int(get_env_variable("GEMINI_MAX_CONCURRENCY", "8")),
+    max_wait_s=float(get_env_variable("GEMINI_MAX_QUEUE_WAIT_S", "30")),
+)
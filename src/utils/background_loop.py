@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+class BackgroundLoop:
+    """
+    One long-lived event loop on a daemon thread, for sync entry points (LangChain tools).
+    Loop-bound singletons (DB writers and engine, prefetch tasks) keep working across calls,
+    unlike a private loop per call that is closed while their tasks are still pending.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run `coro` on the background loop and block until it finishes."""
+        loop = self._get_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(f"{self.name}: run() called from its own loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+SYNC_LOOP = BackgroundLoop("sync-tools-loop")
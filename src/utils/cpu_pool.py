@@ -0,0 +1,82 @@
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from utils.env import get_env_variable
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(get_env_variable(key, str(default)))
+    except ValueError:
+        return default
+
+# CPU_POOL_WORKERS=0 runs CPU-bound work inline in the calling thread.
+CPU_POOL_WORKERS = _env_int("CPU_POOL_WORKERS", os.cpu_count() or 1)
+CPU_POOL_MAX_PENDING = _env_int("CPU_POOL_MAX_PENDING", max(1, CPU_POOL_WORKERS) * 4)
+CPU_POOL_MAX_TASKS_PER_CHILD = _env_int("CPU_POOL_MAX_TASKS_PER_CHILD", 200)
+
+class CpuPool:
+    """
+    Process-pool tier for CPU-bound extraction (HTML parsing, text processing).
+    - Callers hand over raw bytes and get back only the extracted result.
+    - At most `max_pending` jobs are queued or running; extra callers block (backpressure).
+    - Workers are recycled after about `max_tasks_per_child` jobs each to contain memory leaks.
+    """
+
+    def __init__(self, workers: int, max_pending: int, max_tasks_per_child: int) -> None:
+        self.workers = max(0, workers)
+        self.max_tasks_per_child = max_tasks_per_child if max_tasks_per_child > 0 else None
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            retired = None
+            if self._executor is not None and self.max_tasks_per_child and self._submitted >= self.max_tasks_per_child * self.workers:
+                # recycle the whole generation; the old one finishes its in-flight jobs and exits.
+                # (ProcessPoolExecutor's own max_tasks_per_child can deadlock on 3.11 when jobs are queued)
+                retired, self._executor = self._executor, None
+            if self._executor is None:
+                method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context(method))
+                self._submitted = 0
+            self._submitted += 1
+            executor = self._executor
+        if retired is not None:
+            retired.shutdown(wait=False)
+        return executor
+
+    def _reset(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) in a worker process and wait for the result (blocking)."""
+        if not self.enabled:
+            return fn(*args)
+        with self._slots:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result(timeout=timeout)
+            except BrokenProcessPool:
+                self._reset(executor)
+                return self._get_executor().submit(fn, *args).result(timeout=timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+CPU_POOL = CpuPool(CPU_POOL_WORKERS, CPU_POOL_MAX_PENDING, CPU_POOL_MAX_TASKS_PER_CHILD)
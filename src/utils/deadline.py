@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import math
+import time
+
+class Deadline:
+    """
+    Overall time budget for one request. `budget_ms=None` means unbounded.
+    Stages ask for a share of what is left and record the degradations they applied.
+    """
+
+    def __init__(self, budget_ms: Optional[int] = None) -> None:
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self.started = time.monotonic()
+        self.at = self.started + self.budget_ms / 1000 if self.budget_ms else None
+        self.degraded: List[str] = []
+
+    def remaining_ms(self) -> float:
+        if self.at is None:
+            return math.inf
+        return max(0.0, (self.at - time.monotonic()) * 1000)
+
+    def share_ms(self, fraction: float, cap_ms: Optional[float] = None) -> Optional[int]:
+        """`fraction` of the remaining time (capped), or None when unbounded and uncapped."""
+        share = self.remaining_ms() * fraction
+        if cap_ms is not None:
+            share = min(share, cap_ms)
+        return None if math.isinf(share) else int(share)
+
+    def degrade(self, what: str) -> None:
+        if what not in self.degraded:
+            self.degraded.append(what)
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": int((time.monotonic() - self.started) * 1000),
+            "degraded": list(self.degraded),
+        }
+
+# deadline of the request being served; copied into worker threads by asyncio.to_thread
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
@@ -0,0 +1,174 @@
+import codecs
+import ipaddress
+import mmap
+import os
+import socket
+from typing import Iterable, Iterator
+from urllib.parse import unquote, urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.env import get_env_variable
+
+# local files are only readable under these directories (os.pathsep-separated); empty = disabled
+SUMMARIZE_ALLOWED_DIRS = [d for d in get_env_variable("SUMMARIZE_ALLOWED_DIRS", "").split(os.pathsep) if d]
+# http(s) sources are only fetched from these hosts and their subdomains (comma-separated); empty = disabled
+SUMMARIZE_ALLOWED_HOSTS = [h.strip().lower().lstrip(".") for h in get_env_variable("SUMMARIZE_ALLOWED_HOSTS", "").split(",") if h.strip()]
+# every chunk is an LLM call, so the document size is capped for files and URLs alike
+SUMMARIZE_MAX_SOURCE_BYTES = int(get_env_variable("SUMMARIZE_MAX_SOURCE_BYTES", str(5 << 20)))
+READ_WINDOW_BYTES = 1 << 20
+STREAM_CHUNK_BYTES = 64 << 10
+SOURCE_TIMEOUT_S = 30
+MAX_REDIRECTS = 5
+
+def _local_path(source: str) -> str:
+    path = unquote(urlsplit(source).path) if source.startswith("file://") else source
+    real = os.path.realpath(os.path.expanduser(path))
+    roots = [os.path.realpath(os.path.expanduser(d)) for d in SUMMARIZE_ALLOWED_DIRS]
+    if not any(os.path.commonpath([real, root]) == root for root in roots):
+        raise PermissionError(f"{source} is outside SUMMARIZE_ALLOWED_DIRS")
+    return real
+
+def _too_large(source: str) -> ValueError:
+    return ValueError(f"{source} is larger than SUMMARIZE_MAX_SOURCE_BYTES ({SUMMARIZE_MAX_SOURCE_BYTES})")
+
+def _mapped_bytes(path: str) -> Iterator[bytes]:
+    """Read a file window by window through mmap; only the window being decoded is resident."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > SUMMARIZE_MAX_SOURCE_BYTES:
+            raise _too_large(path)
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, len(mm), READ_WINDOW_BYTES):
+                yield mm[start:start + READ_WINDOW_BYTES]
+
+def _check_url(url: str) -> str:
+    """
+    Allow-listed host that resolves to public addresses only (no loopback, private, link-local,
+    metadata). Returns the address to connect to, so the host is not resolved a second time.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme.lower() not in ("http", "https") or not host:
+        raise ValueError(f"unsupported source URL: {url!r}")
+    if not any(host == h or host.endswith("." + h) for h in SUMMARIZE_ALLOWED_HOSTS):
+        raise PermissionError(f"{host} is not in SUMMARIZE_ALLOWED_HOSTS")
+    try:
+        infos = socket.getaddrinfo(host, parts.port or (443 if parts.scheme.lower() == "https" else 80))
+    except socket.gaierror as e:
+        raise ValueError(f"cannot resolve {host}: {e}") from e
+    addrs = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    for addr in addrs:
+        if not addr.is_global:
+            raise PermissionError(f"{host} resolves to non-public address {addr}")
+    if not addrs:
+        raise ValueError(f"cannot resolve {host}: no addresses")
+    return str(addrs[0])
+
+class _PinnedAdapter(HTTPAdapter):
+    """
+    Connects to `addr` for `host` instead of letting urllib3 resolve the name again, which a
+    DNS-rebinding host could answer with an internal address after _check_url passed it.
+    The Host header and TLS (SNI, certificate check) still use the host name.
+    """
+
+    def __init__(self, host: str, addr: str) -> None:
+        self.host = host
+        self.addr = addr
+        super().__init__(max_retries=0)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if host_params["host"].lower() != self.host:
+            raise PermissionError(f"{host_params['host']} was not checked")
+        host_params["host"] = self.addr
+        if host_params["scheme"] == "https":
+            pool_kwargs["server_hostname"] = self.host
+            pool_kwargs["assert_hostname"] = self.host
+        return host_params, pool_kwargs
+
+def _streamed_text(url: str) -> Iterator[str]:
+    with requests.Session() as session:
+        session.trust_env = False  # a proxy would resolve the host itself
+        # redirects are followed by hand so every hop is checked against the allow-list
+        for _ in range(MAX_REDIRECTS + 1):
+            addr = _check_url(url)
+            parts = urlsplit(url)
+            adapter = _PinnedAdapter(parts.hostname.lower(), addr)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            resp = session.get(url, stream=True, timeout=SOURCE_TIMEOUT_S, allow_redirects=False,
+                               headers={"User-Agent": "Mozilla/5.0 (compatible; MCPBot/1.0)",
+                                        "Host": parts.netloc.rpartition("@")[2]})
+            if not resp.is_redirect:
+                break
+            location = resp.headers.get("Location", "")
+            resp.close()
+            url = urljoin(url, location)
+        else:
+            raise ValueError(f"too many redirects for {url}")
+        with resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if not content_type.lower().startswith("text/"):
+                raise ValueError(f"{url} is {content_type or 'of unknown type'}, not text/*")
+            # requests assumes ISO-8859-1 for text/* without a charset; documents are far more often UTF-8
+            charset = (resp.encoding if "charset=" in content_type.lower() else None) or "utf-8"
+            try:
+                codecs.lookup(charset)
+            except LookupError:
+                charset = "utf-8"  # a charset Python does not know
+            if int(resp.headers.get("Content-Length") or 0) > SUMMARIZE_MAX_SOURCE_BYTES:
+                raise _too_large(url)
+            yield from _decode(_capped(resp.iter_content(STREAM_CHUNK_BYTES), url), charset)
+
+def _capped(blocks: Iterable[bytes], source: str) -> Iterator[bytes]:
+    total = 0
+    for block in blocks:
+        total += len(block)
+        if total > SUMMARIZE_MAX_SOURCE_BYTES:
+            raise _too_large(source)
+        yield block
+
+def _decode(blocks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_source_text(source: str) -> Iterator[str]:
+    """
+    Text of a document given by reference, as a stream of pieces.
+    `source` is an http(s) URL (streamed; text/* only, restricted to SUMMARIZE_ALLOWED_HOSTS) or
+    a file:// URI / local path (memory-mapped, restricted to SUMMARIZE_ALLOWED_DIRS). Either is
+    capped at SUMMARIZE_MAX_SOURCE_BYTES. Files are decoded as UTF-8, responses by their charset.
+    """
+    scheme = urlsplit(source).scheme.lower()
+    if scheme in ("http", "https"):
+        return _streamed_text(source)
+    if scheme in ("", "file") or os.path.isabs(source):
+        return _decode(_mapped_bytes(_local_path(source)))
+    raise ValueError(f"unsupported source: {source!r} (expected a path, file:// URI or http(s) URL)")
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int, overlap: int) -> Iterator[str]:
+    """Same chunks as chunking the whole text at once, but holds at most one chunk plus one piece."""
+    text = ""
+    for piece in pieces:
+        text = text + piece if text else piece.lstrip()
+        # trailing whitespace may turn out to be the end of the document, which is stripped
+        limit = len(text.rstrip())
+        start = 0
+        while limit - start > chunk_size:
+            yield text[start:start + chunk_size]
+            start += chunk_size - overlap
+        text = text[start:]
+    text = text.rstrip()
+    if text:
+        yield text
@@ -0,0 +1,30 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from utils.admission import GEMINI_LIMITER
+from utils.env import get_env_variable
+
+T = TypeVar("T")
+
+# Gemini calls block in GEMINI_LIMITER while queued; they get their own threads so a backlog
+# cannot starve the default executor that scrape / search / DB calls run on.
+# Fair ordering applies to calls that hold one of these threads; any beyond wait FIFO for one.
+GEMINI_EXECUTOR_WORKERS = int(get_env_variable("GEMINI_EXECUTOR_WORKERS", str(GEMINI_LIMITER.limit * 4)))
+GEMINI_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, GEMINI_EXECUTOR_WORKERS), thread_name_prefix="gemini")
+
+# page downloads (hedged scrapes fetch more pages than they keep)
+FETCH_EXECUTOR_WORKERS = int(get_env_variable("FETCH_EXECUTOR_WORKERS", "16"))
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, FETCH_EXECUTOR_WORKERS), thread_name_prefix="fetch")
+
+# speculative prefetches between turns; kept apart so they never hold a foreground fetch's thread
+PREFETCH_EXECUTOR_WORKERS = int(get_env_variable("PREFETCH_EXECUTOR_WORKERS", "2"))
+PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, PREFETCH_EXECUTOR_WORKERS), thread_name_prefix="prefetch")
+
+async def run_in(executor: Optional[Executor], fn: Callable[..., T], *args: Any) -> T:
+    """asyncio.to_thread on a given executor (None = the loop's default); context vars are copied the same way."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args))
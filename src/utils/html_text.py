@@ -0,0 +1,21 @@
+from typing import Optional
+from bs4 import BeautifulSoup
+
+MAX_TEXT_CHARS = 10000
+
+def extract_html_text(raw: bytes, encoding: Optional[str] = None, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """
+    Parse raw HTML bytes and return readable text.
+    Kept free of heavy imports so it can run inside CPU pool workers.
+    """
+    soup = BeautifulSoup(raw, "html.parser", from_encoding=encoding)
+
+    for tag in soup(["script", "style", "noscript"]):
+        tag.extract()
+
+    text = soup.get_text(separator="\n", strip=True)
+
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n...[TRUNCATED]..."
+
+    return text
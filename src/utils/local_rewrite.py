@@ -0,0 +1,116 @@
+import re
+from typing import List, NamedTuple, Optional
+
+from utils.env import get_env_variable
+from utils.prompt import build_filter_clauses
+
+# rewrite_path values reported with each turn
+REWRITE_LOCAL = "local"
+REWRITE_LLM = "llm"
+REWRITE_LOCAL_FALLBACK = "local_fallback"
+
+# rewrites at or above this confidence skip the LLM
+REWRITE_LOCAL_MIN_CONFIDENCE = float(get_env_variable("REWRITE_LOCAL_MIN_CONFIDENCE", "0.6"))
+MAX_KEYWORDS = 12
+
+STOP_WORDS_EN = frozenset("""
+a an the and or but of to in on at for from by with about into over under between
+is are was were be been being am do does did done have has had can could should would will shall may might must
+what which who whom whose when where why how
+i me my we our you your he she it its they them their this that these those there here
+please tell show give find explain know want need like just some any all more most very really
+""".split())
+
+# Vietnamese filler is removed only as whole phrases: single syllables (thế, không, có, cho, đi...)
+# are too often part of a compound word (thế giới, không khí) to drop on their own
+STOP_PHRASES_VI = (
+    "như thế nào", "là gì", "là sao", "ra sao", "thế nào", "làm sao", "làm thế nào", "tại sao",
+    "vì sao", "bao nhiêu", "cho tôi", "cho mình", "giúp tôi", "giúp mình", "có thể",
+    "được không", "không nhỉ", "bạn ơi", "tôi muốn", "mình muốn", "tìm hiểu", "hỏi về",
+)
+QUESTION_PHRASES_VI = frozenset((
+    "như thế nào", "là gì", "là sao", "ra sao", "thế nào", "làm sao", "làm thế nào", "tại sao", "vì sao", "bao nhiêu",
+))
+# a stop word dropped from between two keywords may carry meaning ("jobs in Vietnam")
+INTERIOR_STOP_PENALTY = 0.3
+
+_VI_CHARS = re.compile(r"[àáảãạâầấẩẫậăằắẳẵặđèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵ]")
+_QUESTION_START = re.compile(r"^(what|which|who|when|where|why|how|is|are|does|do|can|should|tell|explain)\b")
+# operators the user typed themselves are kept verbatim
+_OPERATOR = re.compile(r'^(site:|filetype:|intitle:|inurl:|-|"|\d{4}\.\.\d{4}$)')
+_TOKEN = re.compile(r'"[^"]+"|\S+')
+_DAY_OR_YEAR = re.compile(r"^\d{1,4}(st|nd|rd|th)?,?$")
+_DROPPED = "\x00"
+
+class LocalRewrite(NamedTuple):
+    query: str
+    confidence: float
+    keywords: List[str]
+
+def detect_language(text: str) -> str:
+    return "vi" if _VI_CHARS.search(text.lower()) else "en"
+
+def _is_stop_en(tokens: List[str], i: int) -> bool:
+    tok = tokens[i].strip(",;:()[]")
+    if tok.lower() not in STOP_WORDS_EN:
+        return False
+    if len(tok) > 1 and tok.isupper():
+        return False  # acronym: IT, WHO, US
+    if tok.lower() == "may":
+        # the month, as in "May 2025" or "3 May"
+        near = tokens[max(0, i - 1):i] + tokens[i + 1:i + 2]
+        return not any(_DAY_OR_YEAR.match(n) for n in near)
+    return True
+
+def local_rewrite(query: str, prefer_academic: bool = False, time_range: Optional[str] = None,
+                  extra_sites: Optional[List[str]] = None, filetype_pdf: bool = False,
+                  target_language: Optional[str] = None) -> LocalRewrite:
+    """
+    Deterministic rewrite: strip English / Vietnamese filler, keep the user's own operators,
+    append the filter clauses from the preferences. The confidence says how likely this is
+    as good as an LLM rewrite; chatty, very short / long queries and translations score low.
+    """
+    language = detect_language(query)
+    text = query.strip().rstrip("?？.!").strip()
+    question = query.strip().endswith(("?", "？")) or bool(_QUESTION_START.match(text.lower()))
+    total = len(_TOKEN.findall(text)) or 1
+
+    if language == "vi":
+        for phrase in STOP_PHRASES_VI:
+            pattern = re.compile(rf"(?<!\w){re.escape(phrase)}(?!\w)", re.IGNORECASE)
+            if pattern.search(text):
+                question = question or phrase in QUESTION_PHRASES_VI
+                text = pattern.sub(f" {_DROPPED} ", text)
+    tokens = _TOKEN.findall(text)
+
+    keywords: List[str] = []
+    operators: List[str] = []
+    keyword_at: List[int] = []
+    dropped_at: List[int] = []
+    for i, tok in enumerate(tokens):
+        clean = tok.strip(",;:()[]")
+        if not clean:
+            continue
+        if clean == _DROPPED or (language == "en" and _is_stop_en(tokens, i)):
+            dropped_at.append(i)
+        elif _OPERATOR.match(clean):
+            operators.append(clean)
+        else:
+            keywords.append(clean)
+            keyword_at.append(i)
+
+    clauses = [c for c in build_filter_clauses(prefer_academic, time_range, extra_sites, filetype_pdf)
+               if c not in operators]
+    rewritten = " ".join(dict.fromkeys(keywords + operators + clauses))
+
+    stripped_ratio = 1 - (len(keywords) + len(operators)) / total
+    confidence = 1.0 - 0.6 * stripped_ratio - (0.15 if question else 0.0)
+    if keyword_at and any(keyword_at[0] < i < keyword_at[-1] for i in dropped_at):
+        confidence -= INTERIOR_STOP_PENALTY
+    if len(keywords) < 2:
+        confidence = min(confidence, 0.4)   # one bare term: synonyms / context help
+    if len(keywords) > MAX_KEYWORDS:
+        confidence = min(confidence, 0.4)   # long prose needs real condensing
+    if target_language and target_language != language:
+        confidence = 0.0                    # needs translation
+    return LocalRewrite(rewritten, round(max(0.0, min(1.0, confidence)), 2), keywords)
@@ -1,6 +1,6 @@
 from typing import Any, Dict, Optional
 from fastmcp import Context
-from configs.db_async import get_supabase_async 
+from db.writer import LOG_WRITER
 import json
 
 LEVEL_MAP = {
@@ -19,27 +19,26 @@ async def log_event(
     session_id: Optional[str] = None,
     request_id: Optional[str] = None,
     meta: Optional[Dict[str, Any]] = None,
+    client_level: Optional[str] = None,
 ) -> None:
     lvl = LEVEL_MAP.get(level.lower(), "info")
+    # bulky lines (previews) can go to the client as debug and still be stored at their own level
+    sent = LEVEL_MAP.get(client_level.lower(), lvl) if client_level else lvl
 
     if ctx:
-        if   lvl == "debug":   await ctx.debug(message)
-        elif lvl == "warning": await ctx.warning(message)
-        elif lvl == "error":   await ctx.error(message)
-        else:                  await ctx.info(message)
+        if   sent == "debug":   await ctx.debug(message)
+        elif sent == "warning": await ctx.warning(message)
+        elif sent == "error":   await ctx.error(message)
+        else:                   await ctx.info(message)
 
-    try:
-        sb = await get_supabase_async()
-        payload = {
-            "session_id": session_id,
-            "request_id": request_id,   
-            "level": lvl,
-            "message": message,
-            "meta": meta or {},
-        }
-        await sb.table("mcp_logs").insert(payload).execute()
-    except Exception:
-        pass
+    # buffered; written in batches by the pooled async engine
+    LOG_WRITER.add({
+        "session_id": session_id,
+        "request_id": request_id,   
+        "level": lvl,
+        "message": message,
+        "meta": meta or {},
+    })
 
 async def report_progress(ctx: Optional[Context], progress: int, total: int = 100, message: Optional[str] = None):
     try:
@@ -0,0 +1,154 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+LOOP_MONITOR_ENABLED = get_env_variable("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL_MS = int(get_env_variable("LOOP_LAG_INTERVAL_MS", "100"))
+LOOP_LAG_THRESHOLD_MS = int(get_env_variable("LOOP_LAG_THRESHOLD_MS", "250"))
+LAG_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+STACK_LIMIT = 15
+
+# tool / stage / session of the current request; child tasks share the same dict
+_tags: ContextVar[Optional[Dict[str, str]]] = ContextVar("loop_tags", default=None)
+# 3.11 has no Task.get_context(), so the watchdog thread looks tags up by task
+_TASK_TAGS: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, str]]" = weakref.WeakKeyDictionary()
+
+@contextmanager
+def loop_scope(tool: str, session_id: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """Tag work started inside the block so a loop stall can be attributed to it."""
+    tags = {"tool": tool, "session": session_id or "", "stage": ""}
+    token = _tags.set(tags)
+    task = asyncio.current_task()
+    previous = _TASK_TAGS.get(task) if task is not None else None
+    if task is not None:
+        _TASK_TAGS[task] = tags
+    try:
+        yield tags
+    finally:
+        _tags.reset(token)
+        if task is not None:
+            if previous is None:
+                _TASK_TAGS.pop(task, None)
+            else:
+                _TASK_TAGS[task] = previous
+
+def set_stage(stage: str) -> None:
+    tags = _tags.get()
+    if tags is not None:
+        tags["stage"] = stage
+
+class LoopMonitor:
+    """
+    Event-loop lag watchdog.
+    - A heartbeat task sleeps `interval_ms` and records how late it woke up
+      (`event_loop_lag_ms` histogram).
+    - A daemon thread notices when the heartbeat has not run for `threshold_ms`, then
+      captures the loop thread's stack and the tags of the task that is running
+      (`event_loop_stalls_total`, recent stalls kept in memory). One capture per stall.
+    """
+
+    def __init__(self, interval_ms: int = LOOP_LAG_INTERVAL_MS, threshold_ms: int = LOOP_LAG_THRESHOLD_MS,
+                 keep: int = 20) -> None:
+        self.interval_s = interval_ms / 1000
+        self.threshold_s = threshold_ms / 1000
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_beat = 0.0
+        self._beats = 0
+        self._open_stall: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._heartbeat is not None and not self._heartbeat.done():
+            return
+        self.stop()
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._install_task_factory(loop)
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat = loop.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,), name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    @staticmethod
+    def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+        inner = loop.get_task_factory()
+        if getattr(inner, "_loop_monitor", False):
+            return
+
+        def factory(loop, coro, **kwargs):
+            task = inner(loop, coro, **kwargs) if inner else asyncio.Task(coro, loop=loop, **kwargs)
+            ctx = kwargs.get("context")
+            tags = ctx.get(_tags) if ctx is not None else _tags.get()
+            if tags is not None:
+                _TASK_TAGS[task] = tags
+            return task
+
+        factory._loop_monitor = True
+        loop.set_task_factory(factory)
+
+    async def _beat(self) -> None:
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - t0 - self.interval_s) * 1000)
+            self._last_beat = now
+            self._beats += 1
+            stall, self._open_stall = self._open_stall, None
+            if stall is not None:
+                # captured while still blocked; record the full stall length
+                stall["blocked_ms"] = int(lag_ms)
+            METRICS.observe("event_loop_lag_ms", lag_ms, buckets=LAG_MS_BUCKETS)
+
+    def _watch(self, stop: threading.Event) -> None:
+        reported_beat = -1
+        check_s = min(self.interval_s, self.threshold_s) / 2
+        while not stop.wait(check_s):
+            blocked_s = time.monotonic() - self._last_beat - self.interval_s
+            if blocked_s >= self.threshold_s and reported_beat != self._beats:
+                reported_beat = self._beats
+                self._capture(blocked_s)
+
+    def _capture(self, blocked_s: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=None)[-STACK_LIMIT:] if frame is not None else []
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        tags = dict(_TASK_TAGS.get(task) or {}) if task is not None else {}
+        stall = {
+            "at": time.time(),
+            "blocked_ms": int(blocked_s * 1000),
+            "task": task.get_name() if task is not None else None,
+            "tags": tags,
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stalls.append(stall)
+        self._open_stall = stall
+        METRICS.inc("event_loop_stalls_total", labels={"tool": tags.get("tool", ""), "stage": tags.get("stage", "")})
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(self.stalls)
+
+LOOP_MONITOR = LoopMonitor()
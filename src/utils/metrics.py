@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+
+DEFAULT_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_MS_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, object]:
+        cumulative, running = {}, 0
+        for bound, c in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += c
+            cumulative[str(bound)] = running
+        return {"count": self.count, "sum": round(self.sum, 3), "max": round(self.max, 3), "buckets": cumulative}
+
+class MetricsRegistry:
+    """Small in-process metrics store (counters, gauges, histograms) keyed by name + labels."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            k = _key(labels)
+            series[k] = series.get(k, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None,
+                buckets: Sequence[float] = DEFAULT_MS_BUCKETS) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            k = _key(labels)
+            if k not in series:
+                series[k] = Histogram(buckets)
+            series[k].observe(value)
+
+    def snapshot(self) -> Dict[str, object]:
+        def fmt(k: LabelKey) -> str:
+            return ",".join(f"{a}={b}" for a, b in k) or "_"
+        with self._lock:
+            return {
+                "counters": {n: {fmt(k): v for k, v in s.items()} for n, s in self._counters.items()},
+                "gauges": {n: {fmt(k): v for k, v in s.items()} for n, s in self._gauges.items()},
+                "histograms": {n: {fmt(k): h.snapshot() for k, h in s.items()} for n, s in self._histograms.items()},
+            }
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,138 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+import threading
+import time
+
+import google.generativeai as genai
+
+from utils.admission import GEMINI_LIMITER, AdmissionRejected
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+T = TypeVar("T")
+
+TIER_FAST = "fast"
+TIER_STRONG = "strong"
+
+STAGE_REWRITE = "rewrite"
+STAGE_CHUNK = "chunk"
+STAGE_MERGE = "merge"
+
+TIER_MODELS = {
+    TIER_FAST: get_env_variable("GEMINI_MODEL_FAST", "gemini-2.5-flash"),
+    TIER_STRONG: get_env_variable("GEMINI_MODEL_STRONG", "gemini-2.5-pro"),
+}
+
+def _stage_tier(key: str, default: str) -> str:
+    # checked at import: a typo would otherwise only surface as a KeyError on the first call of that stage
+    tier = get_env_variable(key, default).strip().lower()
+    if tier not in TIER_MODELS:
+        raise EnvironmentError(f"{key}={tier!r} is not a model tier; use one of {sorted(TIER_MODELS)}")
+    return tier
+
+STAGE_TIERS = {
+    STAGE_REWRITE: _stage_tier("GEMINI_TIER_REWRITE", TIER_FAST),
+    STAGE_CHUNK: _stage_tier("GEMINI_TIER_CHUNK", TIER_FAST),
+    STAGE_MERGE: _stage_tier("GEMINI_TIER_MERGE", TIER_STRONG),
+}
+
+# strong tier is bypassed while its recent calls are slower / flakier than this
+STRONG_MAX_AVG_LATENCY_MS = float(get_env_variable("GEMINI_STRONG_MAX_AVG_LATENCY_MS", "20000"))
+STRONG_MAX_ERROR_RATE = float(get_env_variable("GEMINI_STRONG_MAX_ERROR_RATE", "0.3"))
+HEALTH_WINDOW = 20
+HEALTH_MIN_SAMPLES = 5
+DEGRADED_COOLDOWN_S = 60.0
+
+class TierHealth:
+    """Rolling latency / error window for one tier."""
+
+    def __init__(self, window: int = HEALTH_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.degraded_until = 0.0
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            self._calls.append((latency_ms, ok))
+            if len(self._calls) < HEALTH_MIN_SAMPLES:
+                return
+            avg = sum(l for l, _ in self._calls) / len(self._calls)
+            err = sum(1 for _, good in self._calls if not good) / len(self._calls)
+            if avg > STRONG_MAX_AVG_LATENCY_MS or err > STRONG_MAX_ERROR_RATE:
+                self.degraded_until = time.monotonic() + DEGRADED_COOLDOWN_S
+                # start the next probe period with a clean window
+                self._calls.clear()
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self.degraded_until
+
+_HEALTH: Dict[str, TierHealth] = {TIER_FAST: TierHealth(), TIER_STRONG: TierHealth()}
+
+# stage -> model actually used for the current request
+_models_used: ContextVar[Optional[Dict[str, str]]] = ContextVar("models_used", default=None)
+
+@contextmanager
+def track_models() -> Iterator[Dict[str, str]]:
+    used: Dict[str, str] = {}
+    token = _models_used.set(used)
+    try:
+        yield used
+    finally:
+        _models_used.reset(token)
+
+def record_models(models: Dict[str, str]) -> None:
+    """Credit models used on another request's behalf (shared batch work) to the current one."""
+    used = _models_used.get()
+    if used is not None:
+        used.update(models)
+
+def call_tracked(fn: Callable[..., T], *args: Any) -> Tuple[T, Dict[str, str]]:
+    """fn(*args) plus the models it used, for work whose result is handed to several requests."""
+    with track_models() as used:
+        return fn(*args), dict(used)
+
+@lru_cache(maxsize=None)
+def _get_model(name: str):
+    genai.configure(api_key=get_env_variable("GEMINI_API_KEY"))
+    return genai.GenerativeModel(name)
+
+def route(stage: str) -> str:
+    tier = STAGE_TIERS.get(stage, TIER_STRONG)
+    if tier == TIER_STRONG and _HEALTH[TIER_STRONG].degraded:
+        tier = TIER_FAST
+    return tier
+
+def _call(tier: str, stage: str, prompt: str, generation_config: Any):
+    name = TIER_MODELS[tier]
+    model = _get_model(name)
+    with GEMINI_LIMITER.slot():
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            resp = model.generate_content(prompt, generation_config=generation_config)
+            ok = True
+            return resp
+        finally:
+            latency_ms = (time.perf_counter() - t0) * 1000
+            _HEALTH[tier].record(latency_ms, ok)
+            METRICS.observe("llm_latency_ms", latency_ms, {"stage": stage, "model": name})
+            if not ok:
+                METRICS.inc("llm_errors_total", labels={"stage": stage, "model": name})
+
+def generate(stage: str, prompt: str, generation_config: Any) -> str:
+    """Run one Gemini call for `stage` on the routed model; strong-tier failures retry once on the fast tier."""
+    tier = route(stage)
+    try:
+        resp = _call(tier, stage, prompt, generation_config)
+    except Exception as e:
+        # a shed call is not a model problem; retrying would only queue again
+        if tier != TIER_STRONG or isinstance(e, AdmissionRejected):
+            raise
+        tier = TIER_FAST
+        resp = _call(tier, stage, prompt, generation_config)
+    record_models({stage: TIER_MODELS[tier]})
+    return (getattr(resp, "text", "") or "").strip()
@@ -0,0 +1,156 @@
+from typing import List, Optional, Tuple
+import asyncio
+import time
+
+from fastmcp import Context
+
+from utils.env import get_env_variable
+from utils.metrics import METRICS
+
+VERBOSITY_QUIET = "quiet"      # progress + final result only
+VERBOSITY_NORMAL = "normal"    # + info / warning / error lines
+VERBOSITY_VERBOSE = "verbose"  # + debug lines (content previews, summary replay)
+VERBOSITY_LEVELS = (VERBOSITY_QUIET, VERBOSITY_NORMAL, VERBOSITY_VERBOSE)
+
+NOTIFY_WINDOW_MS = int(get_env_variable("NOTIFY_WINDOW_MS", "250"))
+NOTIFY_MAX_FRAME_BYTES = int(get_env_variable("NOTIFY_MAX_FRAME_BYTES", "8192"))
+NOTIFY_BYTE_BUDGET = int(get_env_variable("NOTIFY_BYTE_BUDGET", "65536"))
+
+class Notifier:
+    """
+    Per-request notification channel in front of the MCP Context.
+    Exposes the same debug/info/warning/error/report_progress calls, so it can be passed
+    anywhere a ctx is expected, but:
+    - filters lines by verbosity,
+    - batches log lines into frames per window (or when a frame is full), one frame per run of
+      same-level lines so a frame keeps its lines' own level,
+    - coalesces progress updates within the window (the last value wins),
+    - stops sending log lines once the per-request byte budget is spent.
+    Call flush() before returning the final result.
+    """
+
+    def __init__(self, ctx: Context, verbosity: Optional[str] = VERBOSITY_NORMAL,
+                 window_ms: int = NOTIFY_WINDOW_MS, max_frame_bytes: int = NOTIFY_MAX_FRAME_BYTES,
+                 byte_budget: int = NOTIFY_BYTE_BUDGET) -> None:
+        self.ctx = ctx
+        self.verbosity = verbosity if verbosity in VERBOSITY_LEVELS else VERBOSITY_NORMAL
+        self.window_s = window_ms / 1000
+        self.max_frame_bytes = max_frame_bytes
+        self.byte_budget = byte_budget
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.lines_dropped = 0
+        self._lines: List[Tuple[str, str]] = []
+        self._line_bytes = 0
+        self._progress: Optional[Tuple[float, float]] = None
+        self._last_progress_at = 0.0
+        self._budget_spent = False
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._timer_due = False
+
+    def _wants(self, level: str) -> bool:
+        if self.verbosity == VERBOSITY_QUIET:
+            return False
+        if self.verbosity == VERBOSITY_NORMAL:
+            return level != "debug"
+        return True
+
+    async def debug(self, message: str) -> None:
+        await self._log("debug", message)
+
+    async def info(self, message: str) -> None:
+        await self._log("info", message)
+
+    async def warning(self, message: str) -> None:
+        await self._log("warning", message)
+
+    async def error(self, message: str) -> None:
+        await self._log("error", message)
+
+    async def _log(self, level: str, message: str) -> None:
+        if not self._wants(level) or self._budget_spent:
+            self.lines_dropped += 1
+            return
+        self._lines.append((level, message))
+        self._line_bytes += len(message.encode("utf-8")) + 1
+        if self._line_bytes >= self.max_frame_bytes:
+            await self._flush_lines()
+        else:
+            self._arm_timer()
+
+    async def report_progress(self, progress: float, total: float = 100) -> None:
+        self._progress = (progress, total)
+        if progress >= total or time.monotonic() - self._last_progress_at >= self.window_s:
+            await self._flush_progress()
+        else:
+            self._arm_timer()
+
+    def _arm_timer(self) -> None:
+        if self._timer is None or self._timer.done():
+            self._timer_due = False
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window_s)
+        self._timer_due = True
+        await self._flush_lines()
+        await self._flush_progress()
+
+    async def _flush_lines(self) -> None:
+        async with self._lock:
+            if not self._lines:
+                return
+            lines, self._lines, self._line_bytes = self._lines, [], 0
+            # one frame per run of same-level lines: levels are never promoted and order is kept
+            runs: List[Tuple[str, List[str]]] = []
+            for level, message in lines:
+                if runs and runs[-1][0] == level:
+                    runs[-1][1].append(message)
+                else:
+                    runs.append((level, [message]))
+            for level, messages in runs:
+                if self._budget_spent:
+                    self.lines_dropped += len(messages)
+                    continue
+                frame = "\n".join(messages)
+                size = len(frame.encode("utf-8"))
+                if self.bytes_sent + size > self.byte_budget:
+                    self._budget_spent = True
+                    self.lines_dropped += len(messages)
+                    frame = f"[notification budget of {self.byte_budget} bytes reached; further log lines suppressed]"
+                    level = "warning"
+                    size = len(frame)
+                await self._send(level, frame, size)
+
+    async def _send(self, level: str, frame: str, size: int) -> None:
+        self.bytes_sent += size
+        self.frames_sent += 1
+        METRICS.inc("notify_frames_total", labels={"verbosity": self.verbosity})
+        METRICS.inc("notify_bytes_total", size, labels={"verbosity": self.verbosity})
+        try:
+            await getattr(self.ctx, level)(frame)
+        except Exception:
+            pass
+
+    async def _flush_progress(self) -> None:
+        async with self._lock:
+            if self._progress is None:
+                return
+            (progress, total), self._progress = self._progress, None
+            self._last_progress_at = time.monotonic()
+            try:
+                await self.ctx.report_progress(progress, total)
+            except Exception:
+                pass
+
+    async def flush(self) -> None:
+        timer, self._timer = self._timer, None
+        if timer is not None and not timer.done():
+            if self._timer_due:
+                # already sending lines it popped from the buffer; cancelling would lose them
+                await timer
+            else:
+                timer.cancel()
+        await self._flush_lines()
+        await self._flush_progress()
@@ -1,5 +1,25 @@
 from typing import Optional, Literal, List
 
+ACADEMIC_SITES = [
+    "site:gov", "site:edu", "site:arxiv.org", "site:nih.gov",
+    "site:nature.com", "site:acm.org", "site:ieee.org", "site:aclweb.org"
+]
+
+def build_filter_clauses(prefer_academic: bool = False,
+                         time_range: str = None,
+                         extra_sites: list[str] = None,
+                         filetype_pdf: bool = False) -> List[str]:
+    """Search operators implied by the preferences: site: filters, year range, filetype:pdf."""
+    sites = list(ACADEMIC_SITES) if prefer_academic else []
+    if extra_sites:
+        sites += [f"site:{s}" if not s.startswith("site:") else s for s in extra_sites]
+    clauses = list(dict.fromkeys(sites))
+    if time_range:
+        clauses.append(time_range)
+    if filetype_pdf or prefer_academic:
+        clauses.append("filetype:pdf")
+    return clauses
+
 def build_rewrite_prompt(user_query: str,
                          prefer_academic: bool = False,
                          time_range: str = None,
@@ -42,24 +62,13 @@ User: "Best practices for RAG evaluation"
 Output: retrieval augmented generation evaluation best practices site:arxiv.org site:aclweb.org filetype:pdf
 """
 
-    sites = []
-    if prefer_academic:
-        sites += [
-            "site:gov", "site:edu", "site:arxiv.org", "site:nih.gov",
-            "site:nature.com", "site:acm.org", "site:ieee.org", "site:aclweb.org"
-        ]
-    if extra_sites:
-        sites += [f"site:{s}" if not s.startswith("site:") else s for s in extra_sites]
-
-    site_clause = " ".join(dict.fromkeys(sites)) if sites else ""
-    time_clause = f" {time_range}" if time_range else ""
-    pdf_clause = " filetype:pdf" if (filetype_pdf or prefer_academic) else ""
+    clauses = " ".join(build_filter_clauses(prefer_academic, time_range, extra_sites, filetype_pdf))
 
     tail = f"""
 Now rewrite this query for web search:
 "{user_query}"
 
-If useful, you may append: "{site_clause}{time_clause}{pdf_clause}". 
+If useful, you may append: "{clauses}". 
 Return only the rewritten query.
 """
     return base.strip() + "\n" + tail.strip()
@@ -0,0 +1,59 @@
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+import weakref
+
+from utils.metrics import METRICS
+
+T = TypeVar("T")
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future) -> None:
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    In-flight de-duplication: concurrent do(key, ...) calls share one execution.
+    The first caller starts the work, later callers with the same key await the same
+    task and get the same result or exception. Nothing is kept once the work finishes,
+    so this is not a cache: a call made after the first one completed runs again.
+    A cancelled waiter only detaches; the work itself is cancelled when its last
+    waiter leaves. The work runs in the first caller's context (session, priority).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        # flights are tied to the loop that runs them
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _Flight]]" = weakref.WeakKeyDictionary()
+
+    def _table(self) -> Dict[Hashable, _Flight]:
+        loop = asyncio.get_running_loop()
+        table = self._flights.get(loop)
+        if table is None:
+            table = self._flights[loop] = {}
+        return table
+
+    def in_flight(self) -> int:
+        return sum(len(t) for t in self._flights.values())
+
+    async def do(self, key: Hashable, start: Callable[[], Awaitable[T]]) -> T:
+        table = self._table()
+        flight = table.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(start()))
+            table[key] = flight
+            flight.task.add_done_callback(lambda _t, f=flight: table.pop(key, None) if table.get(key) is f else None)
+            METRICS.inc("singleflight_calls_total", labels={"name": self.name})
+        else:
+            METRICS.inc("singleflight_shared_total", labels={"name": self.name})
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                if table.get(key) is flight:
+                    del table[key]